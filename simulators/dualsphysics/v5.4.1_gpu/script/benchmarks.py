@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for vtk_to_obj on synthetic particle sets.
+
+Usage:
+    python benchmarks.py splat --particles 1000000 10000000 --threads 1 2 4 8
+    python benchmarks.py write --triangles 2000000
+    python benchmarks.py read --particles 5000000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import numba
+import numpy as np
+import vtk
+from numba import njit
+from vtk.util.numpy_support import numpy_to_vtk, vtk_to_numpy
+from vtk_to_obj import (BRICK_SIZE, MESH_WRITERS, create_density_field, sparse_mesh_from_points,
+                        stencil_half_width, vtk_to_points)
+
+
+def _synthetic_particles(n_points, seed=0):
+    """A dam-break-like block of fluid filling part of the unit cube."""
+    rng = np.random.default_rng(seed)
+    low = np.array([0.05, 0.05, 0.05])
+    high = np.array([0.45, 0.95, 0.35])
+    return (low + (high - low) * rng.random((n_points, 3))).astype(np.float32)
+
+
+@njit
+def _legacy_density_field(points, grid_size=500, radius=0.005):
+    # The serial kernel vtk_to_obj used before: fixed 5x5x5 stencil, one exp
+    # per voxel.
+    field = np.zeros((grid_size, grid_size, grid_size), dtype=np.float32)
+    spacing = 1.0 / grid_size
+    r2 = radius * radius
+    sigma2 = (radius / 2) ** 2
+    for p_idx in range(points.shape[0]):
+        px, py, pz = points[p_idx]
+        i, j, k = int(px / spacing), int(py / spacing), int(pz / spacing)
+        for dx in range(-2, 3):
+            for dy in range(-2, 3):
+                for dz in range(-2, 3):
+                    ni, nj, nk = i + dx, j + dy, k + dz
+                    if 0 <= ni < grid_size and 0 <= nj < grid_size and 0 <= nk < grid_size:
+                        dist2 = ((ni * spacing - px)**2 + (nj * spacing - py)**2 +
+                                 (nk * spacing - pz)**2)
+                        if dist2 < r2:
+                            field[ni, nj, nk] += np.exp(-dist2 / (2 * sigma2))
+    return field
+
+
+def _best_of(repeat, func, *args):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _sparse_splat_time(points, grid_size, radius, brick_size=BRICK_SIZE):
+    # Splatting time of the default sparse brick path, as reported by the
+    # CLI (brick binning plus `_splat_bricks`, without marching cubes).
+    timings = {}
+    sparse_mesh_from_points(points, grid_size=grid_size, radius=radius,
+                            brick_size=brick_size, timings=timings)
+    return timings["splat"]
+
+
+def benchmark_splat(particles=(1_000_000, 10_000_000), threads=None,
+                    grid_size=500, radius=0.005, repeat=3, legacy=True):
+    """
+    Time the dense `create_density_field` and the splatting of the sparse
+    brick grid (the CLI default) for each particle count and numba thread
+    count, against the previous serial kernel as baseline. Kernels are
+    compiled on a small warm-up set first, so only the splatting is timed.
+    """
+    if threads is None:
+        threads = sorted({1, 2, 4, 8, 16, 32, numba.config.NUMBA_NUM_THREADS})
+    threads = [t for t in threads if t <= numba.config.NUMBA_NUM_THREADS]
+
+    warmup = _synthetic_particles(1000)
+    create_density_field(warmup, grid_size=16, radius=radius)
+    sparse_mesh_from_points(warmup, grid_size=32, radius=radius)
+    if legacy:
+        _legacy_density_field(warmup, 16, radius)
+
+    spacing = 1.0 / grid_size
+    print(f"Density splatting, {grid_size}^3 grid, radius {radius:g} "
+          f"(stencil {2 * stencil_half_width(radius, spacing) + 1}^3), "
+          f"best of {repeat}, threading layer {numba.threading_layer()}")
+    for n_points in particles:
+        points = _synthetic_particles(n_points)
+        if legacy:
+            elapsed = _best_of(repeat, _legacy_density_field, points,
+                               grid_size, radius)
+            print(f"  {n_points:>11,d} particles  legacy serial (5^3)   "
+                  f"{elapsed:8.2f} s  {n_points / elapsed / 1e6:7.2f} Mpart/s")
+        serial = {}
+        for n_threads in threads:
+            numba.set_num_threads(n_threads)
+            dense = _best_of(repeat, create_density_field, points, grid_size, radius)
+            sparse = min(_sparse_splat_time(points, grid_size, radius) for _ in range(repeat))
+            for name, elapsed in (("dense", dense), ("sparse", sparse)):
+                serial.setdefault(name, elapsed)
+                print(f"  {n_points:>11,d} particles  {n_threads:3d} thread(s) {name:<8}"
+                      f"{elapsed:8.2f} s  {n_points / elapsed / 1e6:7.2f} Mpart/s  "
+                      f"x{serial[name] / elapsed:5.2f}")
+        numba.set_num_threads(numba.config.NUMBA_NUM_THREADS)
+
+
+def _synthetic_surface(n_triangles):
+    """A wavy closed-ish sheet with about `n_triangles` triangles, in grid units."""
+    n = max(int(np.sqrt(n_triangles / 2)) + 1, 2)
+    u, v = np.meshgrid(np.linspace(0, 2 * np.pi, n), np.linspace(0, np.pi, n), indexing="ij")
+    r = 150.0 + 5.0 * np.sin(8 * u) * np.sin(6 * v)
+    verts = np.stack([250 + r * np.cos(u) * np.sin(v), 250 + r * np.sin(u) * np.sin(v),
+                      250 + r * np.cos(v)], axis=-1).reshape(-1, 3).astype(np.float32)
+    idx = np.arange(n * n, dtype=np.int32).reshape(n, n)
+    a, b, c, d = idx[:-1, :-1], idx[1:, :-1], idx[1:, 1:], idx[:-1, 1:]
+    faces = np.concatenate([np.stack([a, b, c], -1).reshape(-1, 3),
+                            np.stack([a, c, d], -1).reshape(-1, 3)])
+    return verts, faces
+
+
+def _legacy_save_obj(filename, verts, faces):
+    # The writer vtk_to_obj used before: one f-string per line.
+    with open(filename, 'w') as f:
+        for v in verts:
+            f.write(f"v {v[0]} {v[1]} {v[2]}\n")
+        for face in faces:
+            f.write(f"f {int(face[0]+1)} {int(face[1]+1)} {int(face[2]+1)}\n")
+
+
+def benchmark_write(n_triangles=2_000_000, repeat=3, legacy=True, out_dir=None):
+    """
+    Time each `--format` writer (and the previous per-line OBJ writer) on a
+    synthetic surface, reporting file size and write throughput.
+    """
+    verts, faces = _synthetic_surface(n_triangles)
+    writers = [(fmt, ext, writer) for fmt, (ext, writer) in sorted(MESH_WRITERS.items())]
+    if legacy:
+        writers.insert(0, ("obj (legacy)", ".obj", _legacy_save_obj))
+
+    print(f"Mesh writing, {len(verts):,d} vertices, {len(faces):,d} triangles, "
+          f"best of {repeat}")
+    with tempfile.TemporaryDirectory(dir=out_dir) as tmp_dir:
+        for name, ext, writer in writers:
+            filename = os.path.join(tmp_dir, f"mesh{ext}")
+            elapsed = _best_of(repeat, writer, filename, verts, faces)
+            size = os.path.getsize(filename) / 1e6
+            print(f"  {name:<13} {elapsed:7.2f} s  {size:8.1f} MB  {size / elapsed:8.1f} MB/s  "
+                  f"{len(faces) / elapsed / 1e6:6.2f} Mtri/s")
+
+
+def _write_particle_vtk(filename, points, seed=0):
+    """A binary legacy .vtk frame laid out like partvtk output: points, one
+    vertex cell per particle and Vel/Rhop point data."""
+    rng = np.random.default_rng(seed)
+    data = vtk.vtkPolyData()
+    vtk_points = vtk.vtkPoints()
+    vtk_points.SetData(numpy_to_vtk(points, deep=True))
+    data.SetPoints(vtk_points)
+    verts = vtk.vtkCellArray()
+    verts.SetData(numpy_to_vtk(np.arange(len(points) + 1, dtype=np.int64), deep=True,
+                               array_type=vtk.VTK_ID_TYPE),
+                  numpy_to_vtk(np.arange(len(points), dtype=np.int64), deep=True,
+                               array_type=vtk.VTK_ID_TYPE))
+    data.SetVerts(verts)
+    for name, components in (("Vel", 3), ("Rhop", 1)):
+        array = numpy_to_vtk(rng.random((len(points), components)).astype(np.float32), deep=True)
+        array.SetName(name)
+        data.GetPointData().AddArray(array)
+    writer = vtk.vtkPolyDataWriter()
+    writer.SetFileName(filename)
+    writer.SetInputData(data)
+    writer.SetFileTypeToBinary()
+    writer.Write()
+
+
+def _vtk_reader_points(vtk_file):
+    # The reader vtk_to_obj used before: a full vtkPolyData per frame.
+    reader = vtk.vtkPolyDataReader()
+    reader.SetFileName(vtk_file)
+    reader.Update()
+    return vtk_to_numpy(reader.GetOutput().GetPoints().GetData())
+
+
+def benchmark_read(particles=(5_000_000,), repeat=3, legacy=True, out_dir=None):
+    """
+    Time `vtk_to_points` (POINTS block memory-mapped from the file) against
+    VTK's legacy reader on partvtk-like binary frames. The page cache is
+    warm after the first run, so this compares parsing cost, not disk speed.
+    """
+    print(f"Reading binary legacy .vtk frames, best of {repeat}")
+    with tempfile.TemporaryDirectory(dir=out_dir) as tmp_dir:
+        for n_points in particles:
+            filename = os.path.join(tmp_dir, "PartFluid_0000.vtk")
+            _write_particle_vtk(filename, _synthetic_particles(n_points))
+            size = os.path.getsize(filename) / 1e6
+            readers = [("memmap", vtk_to_points)]
+            if legacy:
+                readers.insert(0, ("vtk reader", _vtk_reader_points))
+            for name, reader in readers:
+                elapsed = _best_of(repeat, reader, filename)
+                print(f"  {n_points:>11,d} particles  {name:<11} {elapsed:7.3f} s  "
+                      f"{size / elapsed:9.1f} MB/s of file  "
+                      f"{n_points / elapsed / 1e6:8.2f} Mpart/s")
+            os.remove(filename)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    splat = sub.add_parser("splat", help="Parallel dense and sparse density splatting vs. the serial kernel")
+    splat.add_argument("--particles", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    splat.add_argument("--threads", type=int, nargs="+", default=None,
+                       help="numba thread counts to time (default: powers of two up to the core count)")
+    splat.add_argument("--grid-size", type=int, default=500)
+    splat.add_argument("--radius", type=float, default=0.005)
+    splat.add_argument("--repeat", type=int, default=3)
+    splat.add_argument("--no-legacy", action="store_true",
+                       help="Skip the previous serial kernel")
+
+    write = sub.add_parser("write", help="Bulk OBJ/PLY/GLB writers vs. the per-line OBJ writer")
+    write.add_argument("--triangles", type=int, default=2_000_000)
+    write.add_argument("--repeat", type=int, default=3)
+    write.add_argument("--no-legacy", action="store_true",
+                       help="Skip the previous per-line OBJ writer")
+    write.add_argument("--out-dir", default=None,
+                       help="Directory for the temporary files (default: system temp dir)")
+
+    read = sub.add_parser("read", help="Memory-mapped .vtk points vs. VTK's legacy reader")
+    read.add_argument("--particles", type=int, nargs="+", default=[5_000_000])
+    read.add_argument("--repeat", type=int, default=3)
+    read.add_argument("--no-legacy", action="store_true",
+                      help="Skip VTK's reader")
+    read.add_argument("--out-dir", default=None,
+                      help="Directory for the temporary frames (default: system temp dir)")
+
+    args = parser.parse_args()
+    if args.benchmark == "splat":
+        benchmark_splat(args.particles, args.threads, args.grid_size,
+                        args.radius, args.repeat, not args.no_legacy)
+    elif args.benchmark == "write":
+        benchmark_write(args.triangles, args.repeat, not args.no_legacy, args.out_dir)
+    elif args.benchmark == "read":
+        benchmark_read(args.particles, args.repeat, not args.no_legacy, args.out_dir)
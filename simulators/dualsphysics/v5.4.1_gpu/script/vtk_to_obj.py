@@ -1,13 +1,61 @@
 import vtk
 import numpy as np
-from numba import njit
+from numba import config, njit, prange
 from vtk.util.numpy_support import vtk_to_numpy
 from skimage import measure
 import os
+import json
+import math
+import struct
 import argparse
-from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import NamedTuple
+
+# With TBB the interpreter hangs on exit once parallel kernels have been
+# launched from the converter threads; prefer OpenMP or numba's workqueue.
+config.THREADING_LAYER_PRIORITY = ["omp", "workqueue", "tbb"]
+
+# Legacy VTK binary data is big-endian.
+VTK_POINT_DTYPES = {"float": ">f4", "double": ">f8"}
+
+def legacy_vtk_points(vtk_file):
+    # A read-only big-endian memmap of the POINTS block of a binary legacy
+    # .vtk file, or None for files the header parser does not handle (ASCII,
+    # field data before the points, ...).
+    with open(vtk_file, "rb") as f:
+        if not f.readline().startswith(b"# vtk DataFile"):
+            return None
+        f.readline()  # title
+        if f.readline().strip().upper() != b"BINARY":
+            return None
+        while True:
+            line = f.readline()
+            if not line:
+                return None
+            words = line.split()
+            if not words or words[0].upper() == b"DATASET":
+                continue
+            if words[0].upper() != b"POINTS" or len(words) != 3:
+                return None
+            n_points = int(words[1])
+            dtype = VTK_POINT_DTYPES.get(words[2].decode("ascii").lower())
+            offset = f.tell()
+            break
+    if dtype is None or offset + n_points * 3 * np.dtype(dtype).itemsize > os.path.getsize(vtk_file):
+        return None
+    if not n_points:
+        return np.empty((0, 3), dtype=dtype)
+    return np.memmap(vtk_file, dtype=dtype, mode="r", offset=offset, shape=(n_points, 3))
 
 def vtk_to_points(vtk_file):
+    # Binary legacy files are read straight from their POINTS block; only the
+    # byte swap copies them. Anything else goes through VTK's reader.
+    points = legacy_vtk_points(vtk_file)
+    if points is not None:
+        return points.astype(points.dtype.newbyteorder("="))
     reader = vtk.vtkPolyDataReader()
     reader.SetFileName(vtk_file)
     reader.Update()
@@ -15,83 +63,924 @@ def vtk_to_points(vtk_file):
     points = vtk_to_numpy(data.GetPoints().GetData())
     return points
 
-@njit
-def create_density_field(points, grid_size=500, radius=0.005):
-    field = np.zeros((grid_size, grid_size, grid_size), dtype=np.float32)
-    spacing = 1.0 / grid_size
-    r2 = radius * radius
+# DualSPHysics .bi4 output is a JBinaryData file: a fixed header followed by
+# a tree of items, each holding named scalar values, named arrays and child
+# items. Strings are a uint32 length and their characters, bools are int32.
+BI4_HEAD_SIZE = 60
+BI4_VALUE_FORMATS = {2: "i", 3: "b", 4: "B", 5: "h", 6: "H", 7: "i", 8: "I", 9: "q", 10: "Q",
+                     11: "f", 12: "d", 20: "3i", 21: "3I", 22: "3f", 23: "3d"}
+BI4_ARRAY_DTYPES = {3: ("i1", 1), 4: ("u1", 1), 5: ("i2", 1), 6: ("u2", 1), 7: ("i4", 1),
+                    8: ("u4", 1), 9: ("i8", 1), 10: ("u8", 1), 11: ("f4", 1), 12: ("f8", 1),
+                    20: ("i4", 3), 21: ("u4", 3), 22: ("f4", 3), 23: ("f8", 3)}
+BI4_TEXT = 1
+
+# Particle types as selected by partvtk's -onlytype; boundary particles are
+# numbered before the fluid: fixed, then moving, then floating.
+PARTICLE_TYPES = ("fixed", "moving", "floating", "fluid")
+PARTICLE_TYPE_GROUPS = {"all": PARTICLE_TYPES, "bound": ("fixed", "moving", "floating")}
+
+def parse_onlytype(spec):
+    # "-all,+fluid" -> {"fluid"}, starting from all particles like partvtk.
+    selected = set(PARTICLE_TYPES)
+    for token in filter(None, (t.strip() for t in spec.split(","))):
+        sign, name = (token[0], token[1:]) if token[0] in "+-" else ("+", token)
+        if name not in PARTICLE_TYPES and name not in PARTICLE_TYPE_GROUPS:
+            raise ValueError(f"Unknown particle type {name!r} in {spec!r}")
+        types = PARTICLE_TYPE_GROUPS.get(name, (name,))
+        selected = selected | set(types) if sign == "+" else selected - set(types)
+    return selected
+
+def read_bi4(bi4_file):
+    # Returns the values of all items by name and the arrays by name as
+    # (dtype, shape, byte offset), without reading any array data.
+    with open(bi4_file, "rb") as f:
+        head = f.read(BI4_HEAD_SIZE)
+        if len(head) < BI4_HEAD_SIZE or not head.startswith(b"#File"):
+            raise ValueError(f"{bi4_file} is not a DualSPHysics binary data file")
+        order = ">" if head[16] == 1 else "<"
+        f.seek(struct.unpack_from(order + "I", head, 20)[0])
+        values, arrays = {}, {}
+
+        def unpack(fmt):
+            fmt = order + fmt
+            return struct.unpack(fmt, f.read(struct.calcsize(fmt)))
+
+        def text():
+            return f.read(unpack("I")[0]).decode("latin-1")
+
+        def expect(code):
+            if text() != code:
+                raise ValueError(f"{bi4_file}: unexpected record before byte {f.tell()}")
+
+        def item():
+            expect("\nITEM\n")
+            text()             # name
+            unpack("ii")       # hidden, values hidden
+            text(), text()     # float and double output formats
+            n_arrays, n_items = unpack("II")
+            expect("\nVALUES")
+            for _ in range(unpack("I")[0]):
+                kind = unpack("i")[0]
+                name = text()
+                if kind == BI4_TEXT:
+                    values[name] = text()
+                elif kind in BI4_VALUE_FORMATS:
+                    value = unpack(BI4_VALUE_FORMATS[kind])
+                    values[name] = value[0] if len(value) == 1 else value
+                else:
+                    raise ValueError(f"{bi4_file}: unknown type {kind} of value {name!r}")
+            for _ in range(n_arrays):
+                expect("\nARRAY")
+                name = text()
+                unpack("i")        # hidden
+                kind, count, size = unpack("iII")
+                if kind in BI4_ARRAY_DTYPES:
+                    dtype, components = BI4_ARRAY_DTYPES[kind]
+                    dtype = np.dtype(order + dtype)
+                    if size != count * components * dtype.itemsize:
+                        raise ValueError(f"{bi4_file}: array {name!r} holds {size} bytes, "
+                                         f"not {count} x {components} x {dtype}")
+                    arrays[name] = (dtype, (count, components) if components > 1 else (count,), f.tell())
+                f.seek(size, os.SEEK_CUR)
+            for _ in range(n_items):
+                item()
+
+        item()
+    return values, arrays
+
+def _bi4_array(bi4_file, arrays, name):
+    dtype, shape, offset = arrays[name]
+    if not shape[0]:
+        return np.empty(shape, dtype=dtype.newbyteorder("="))
+    # A view of the file; only byte-swapped when it was written big-endian.
+    data = np.asarray(np.memmap(bi4_file, dtype=dtype, mode="r", offset=offset, shape=shape))
+    return data if dtype.isnative else data.astype(dtype.newbyteorder("="))
+
+def bi4_to_points(bi4_file, particle_types=PARTICLE_TYPES):
+    # Positions of the particles of `particle_types` in a Part_XXXX.bi4 file,
+    # memory-mapped instead of converted to .vtk by partvtk first.
+    values, arrays = read_bi4(bi4_file)
+    name = "Pos" if "Pos" in arrays else "Posd"
+    if name not in arrays:
+        raise ValueError(f"{bi4_file} holds no particle positions")
+    points = _bi4_array(bi4_file, arrays, name)
+    if set(particle_types) >= set(PARTICLE_TYPES):
+        return points
+    counts = ("CaseNfixed", "CaseNmoving", "CaseNfloat")
+    if not all(c in values for c in counts):
+        # DualSPHysics v5 keeps the case description in Part_Head.ibi4.
+        head_file = os.path.join(os.path.dirname(bi4_file), "Part_Head.ibi4")
+        if os.path.exists(head_file):
+            values = {**read_bi4(head_file)[0], **values}
+    if not all(c in values for c in counts) or "Idp" not in arrays:
+        raise ValueError(f"{bi4_file}: particle types are unknown, cannot select "
+                         f"{', '.join(sorted(particle_types))}")
+    # Particle ids are numbered by type, so each type is a range of ids.
+    first_ids = np.cumsum([0] + [values[c] for c in counts])
+    idp = _bi4_array(bi4_file, arrays, "Idp")
+    kinds = np.searchsorted(first_ids[1:], idp, side="right")
+    wanted = [k for k, t in enumerate(PARTICLE_TYPES) if t in particle_types]
+    return points[np.isin(kinds, wanted)]
+
+PARTICLE_EXTENSIONS = (".vtk", ".bi4")
+
+def read_points(particle_file, particle_types=PARTICLE_TYPES):
+    # Particle positions of a .vtk (partvtk) or .bi4 (raw DualSPHysics) frame;
+    # partvtk has already applied its own type selection to .vtk files.
+    if particle_file.endswith(".bi4"):
+        return bi4_to_points(particle_file, particle_types)
+    return vtk_to_points(particle_file)
+
+# The parallel kernel may be launched from several converter threads at once,
+# which numba's default "workqueue" threading layer does not support. It
+# already keeps every core busy, so launches are simply serialised.
+_splat_lock = threading.Lock()
+
+def stencil_half_width(radius, spacing):
+    # Voxels further than `radius` from a particle get no weight.
+    return max(int(math.ceil(radius / spacing)), 0)
+
+class GridDomain(NamedTuple):
+    origin: np.ndarray  # position of voxel (0, 0, 0)
+    spacing: float      # voxel edge length
+    shape: tuple        # voxel counts along x, y, z
+
+def unit_domain(grid_size):
+    # The legacy grid: grid_size^3 voxels over [0, 1)^3.
+    return GridDomain(np.zeros(3), 1.0 / grid_size, (grid_size,) * 3)
+
+def domain_from_bounds(low, high, radius, grid_size=500, voxel_size=None):
+    # Grid around the particle bounding box, padded by the kernel radius and
+    # one voxel so the surface closes. Voxels are cubes of `voxel_size`, or
+    # sized so the longest axis gets `grid_size` voxels; the other axes get
+    # only as many voxels as their extent needs.
+    low = np.asarray(low, dtype=np.float64)
+    extent = np.asarray(high, dtype=np.float64) - low + 2 * radius
+    spacing = voxel_size or max(extent.max(), 1e-12) / (grid_size - 3)
+    shape = tuple(int(n) for n in np.ceil(extent / spacing - 1e-9).astype(np.int64) + 3)
+    return GridDomain(low - radius - spacing, spacing, shape)
+
+def points_bounds(points):
+    return points.min(axis=0).astype(np.float64), points.max(axis=0).astype(np.float64)
+
+@njit(cache=True)
+def _bin_points_by_plane(points, spacing, n_planes, half_width):
+    # Counting sort of the particles by their x plane, shifted by `half_width`
+    # so particles just outside the grid still reach the border planes.
+    # Particles of plane i are order[starts[i + half_width]:starts[i + half_width + 1]].
+    n_bins = n_planes + 2 * half_width
+    bins = np.empty(points.shape[0], dtype=np.int64)
+    starts = np.zeros(n_bins + 1, dtype=np.int64)
+    for p_idx in range(points.shape[0]):
+        b = int(np.floor(points[p_idx, 0] / spacing)) + half_width
+        if b < 0 or b >= n_bins:
+            b = -1
+        bins[p_idx] = b
+        if b >= 0:
+            starts[b + 1] += 1
+    for b in range(n_bins):
+        starts[b + 1] += starts[b]
+    order = np.empty(starts[n_bins], dtype=np.int64)
+    cursor = starts[:n_bins].copy()
+    for p_idx in range(points.shape[0]):
+        b = bins[p_idx]
+        if b >= 0:
+            order[cursor[b]] = p_idx
+            cursor[b] += 1
+    return order, starts
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _splat_planes(points, order, starts, field, spacing, half_width, r2, inv_two_sigma2):
+    # Each x plane of the field is filled by exactly one thread from the
+    # particles of the 2 * half_width + 1 bins around it, so no two threads
+    # ever write the same voxel and no atomics or per-thread copies of the
+    # field are needed. The Gaussian is separable, so per particle and plane
+    # only one exp per axis offset is evaluated instead of one per voxel.
+    nx, ny, nz = field.shape
+    width = 2 * half_width + 1
+    for i in prange(nx):
+        wz = np.empty(width, dtype=np.float64)
+        dz2 = np.empty(width, dtype=np.float64)
+        gx = i * spacing
+        for q in range(starts[i], starts[i + width]):
+            p_idx = order[q]
+            px = points[p_idx, 0]
+            py = points[p_idx, 1]
+            pz = points[p_idx, 2]
+            dx2 = (gx - px) ** 2
+            if dx2 >= r2:
+                continue
+            wx = np.exp(-dx2 * inv_two_sigma2)
+            j0 = max(int(np.floor(py / spacing)) - half_width, 0)
+            j1 = min(int(np.floor(py / spacing)) + half_width + 1, ny)
+            k0 = max(int(np.floor(pz / spacing)) - half_width, 0)
+            k1 = min(int(np.floor(pz / spacing)) + half_width + 1, nz)
+            for k in range(k0, k1):
+                d2 = (k * spacing - pz) ** 2
+                dz2[k - k0] = d2
+                wz[k - k0] = np.exp(-d2 * inv_two_sigma2)
+            for j in range(j0, j1):
+                dxy2 = dx2 + (j * spacing - py) ** 2
+                if dxy2 >= r2:
+                    continue
+                wxy = wx * np.exp(-(dxy2 - dx2) * inv_two_sigma2)
+                for k in range(k0, k1):
+                    if dxy2 + dz2[k - k0] < r2:
+                        field[i, j, k] += wxy * wz[k - k0]
+
+def create_density_field(points, grid_size=500, radius=0.005, domain=None):
+    domain = domain or unit_domain(grid_size)
+    field = np.zeros(domain.shape, dtype=np.float32)
+    spacing = domain.spacing
+    half_width = stencil_half_width(radius, spacing)
     sigma2 = (radius / 2) ** 2
-    n_points = points.shape[0]
-
-    for p_idx in range(n_points):
-        px, py, pz = points[p_idx]
-        i, j, k = int(px / spacing), int(py / spacing), int(pz / spacing)
-        for dx in range(-2, 3):
-            for dy in range(-2, 3):
-                for dz in range(-2, 3):
-                    ni, nj, nk = i + dx, j + dy, k + dz
-                    if 0 <= ni < grid_size and 0 <= nj < grid_size and 0 <= nk < grid_size:
-                        gx = ni * spacing
-                        gy = nj * spacing
-                        gz = nk * spacing
-                        dist2 = (gx - px)**2 + (gy - py)**2 + (gz - pz)**2
-                        if dist2 < r2:
-                            field[ni, nj, nk] += np.exp(-dist2 / (2 * sigma2))
+    points = np.ascontiguousarray(np.asarray(points, dtype=np.float64) - domain.origin)
+    order, starts = _bin_points_by_plane(points, spacing, domain.shape[0], half_width)
+    with _splat_lock:
+        _splat_planes(points, order, starts, field, spacing, half_width,
+                      radius * radius, 1.0 / (2 * sigma2))
     return field
 
 def mesh_from_field(field, iso=0.5):
     verts, faces, _, _ = measure.marching_cubes(field, level=iso)
     return verts, faces
 
+# Edge length in voxels of the bricks of the sparse density grid.
+BRICK_SIZE = 16
+
+@njit(cache=True)
+def _mark_bricks(points, origin, spacing, grid_shape, half_width, brick_size):
+    # Bricks whose samples (own voxels plus the first plane of the next brick)
+    # lie within the stencil of some particle. Bricks without cells, at the
+    # far end of the grid, are never marked.
+    n_bricks = np.empty(3, dtype=np.int64)
+    last = np.empty(3, dtype=np.int64)
+    for a in range(3):
+        n_bricks[a] = (grid_shape[a] + brick_size - 1) // brick_size
+        last[a] = (grid_shape[a] - 2) // brick_size
+    occupied = np.zeros((n_bricks[0], n_bricks[1], n_bricks[2]), dtype=np.bool_)
+    lo = np.empty(3, dtype=np.int64)
+    hi = np.empty(3, dtype=np.int64)
+    for p_idx in range(points.shape[0]):
+        inside = True
+        for a in range(3):
+            c = int(np.floor((points[p_idx, a] - origin[a]) / spacing))
+            v0 = max(c - half_width, 0)
+            v1 = min(c + half_width, grid_shape[a] - 1)
+            if v0 > v1:
+                inside = False
+                break
+            lo[a] = max((v0 - 1) // brick_size, 0)
+            hi[a] = min(v1 // brick_size, last[a])
+        if not inside:
+            continue
+        for bx in range(lo[0], hi[0] + 1):
+            for by in range(lo[1], hi[1] + 1):
+                for bz in range(lo[2], hi[2] + 1):
+                    occupied[bx, by, bz] = True
+    return occupied
+
+@njit(cache=True)
+def _bin_points_by_brick(points, origin, spacing, grid_shape, half_width, n_bricks, brick_size):
+    # Counting sort of the particles by the brick of their voxel, clamped into
+    # the grid so particles just outside it still reach the border bricks.
+    # Returns the particles relative to `origin` and their (unclamped) voxel
+    # indices, in bin order;
+    # those of brick (bx, by, bz) are [starts[b]:starts[b + 1]] with
+    # b = (bx * n_bricks[1] + by) * n_bricks[2] + bz.
+    n_bins = n_bricks[0] * n_bricks[1] * n_bricks[2]
+    bins = np.empty(points.shape[0], dtype=np.int64)
+    starts = np.zeros(n_bins + 1, dtype=np.int64)
+    for p_idx in range(points.shape[0]):
+        b = 0
+        for a in range(3):
+            c = int(np.floor((points[p_idx, a] - origin[a]) / spacing))
+            if c < -half_width or c >= grid_shape[a] + half_width:
+                b = -1
+                break
+            c = min(max(c, 0), grid_shape[a] - 1)
+            b = b * n_bricks[a] + c // brick_size
+        bins[p_idx] = b
+        if b >= 0:
+            starts[b + 1] += 1
+    for b in range(n_bins):
+        starts[b + 1] += starts[b]
+    sorted_points = np.empty((starts[n_bins], 3), dtype=np.float64)
+    cells = np.empty((starts[n_bins], 3), dtype=np.int32)
+    cursor = starts[:n_bins].copy()
+    for p_idx in range(points.shape[0]):
+        b = bins[p_idx]
+        if b >= 0:
+            q = cursor[b]
+            for a in range(3):
+                sorted_points[q, a] = points[p_idx, a] - origin[a]
+                cells[q, a] = int(np.floor(sorted_points[q, a] / spacing))
+            cursor[b] += 1
+    return sorted_points, cells, starts
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _splat_bricks(points, cells, starts, brick_coords, values, grid_shape, n_bricks,
+                  spacing, half_width, brick_size, r2, inv_two_sigma2):
+    # Each brick, including its shared upper face, is filled by one thread
+    # from the particles of the surrounding bins. Bins are always visited in
+    # ascending order, so a voxel shared by two bricks sums the same
+    # particles in the same order and gets bit-identical values in both.
+    width = 2 * half_width + 1
+    for b in prange(brick_coords.shape[0]):
+        wz = np.empty(width, dtype=np.float64)
+        dz2 = np.empty(width, dtype=np.float64)
+        o0 = brick_coords[b, 0] * brick_size
+        o1 = brick_coords[b, 1] * brick_size
+        o2 = brick_coords[b, 2] * brick_size
+        e0 = min(o0 + brick_size, grid_shape[0] - 1)
+        e1 = min(o1 + brick_size, grid_shape[1] - 1)
+        e2 = min(o2 + brick_size, grid_shape[2] - 1)
+        for nbx in range(max((o0 - half_width) // brick_size, 0), min((e0 + half_width) // brick_size + 1, n_bricks[0])):
+            for nby in range(max((o1 - half_width) // brick_size, 0), min((e1 + half_width) // brick_size + 1, n_bricks[1])):
+                for nbz in range(max((o2 - half_width) // brick_size, 0), min((e2 + half_width) // brick_size + 1, n_bricks[2])):
+                    nb = (nbx * n_bricks[1] + nby) * n_bricks[2] + nbz
+                    for q in range(starts[nb], starts[nb + 1]):
+                        i0 = max(cells[q, 0] - half_width, o0)
+                        i1 = min(cells[q, 0] + half_width, e0)
+                        j0 = max(cells[q, 1] - half_width, o1)
+                        j1 = min(cells[q, 1] + half_width, e1)
+                        k0 = max(cells[q, 2] - half_width, o2)
+                        k1 = min(cells[q, 2] + half_width, e2)
+                        if i0 > i1 or j0 > j1 or k0 > k1:
+                            continue
+                        px = points[q, 0]
+                        py = points[q, 1]
+                        pz = points[q, 2]
+                        for k in range(k0, k1 + 1):
+                            d2 = (k * spacing - pz) ** 2
+                            dz2[k - k0] = d2
+                            wz[k - k0] = np.exp(-d2 * inv_two_sigma2)
+                        for i in range(i0, i1 + 1):
+                            dx2 = (i * spacing - px) ** 2
+                            if dx2 >= r2:
+                                continue
+                            wx = np.exp(-dx2 * inv_two_sigma2)
+                            for j in range(j0, j1 + 1):
+                                dy2 = (j * spacing - py) ** 2
+                                if dx2 + dy2 >= r2:
+                                    continue
+                                wxy = wx * np.exp(-dy2 * inv_two_sigma2)
+                                for k in range(k0, k1 + 1):
+                                    if dx2 + dy2 + dz2[k - k0] < r2:
+                                        values[b, i - o0, j - o1, k - o2] += wxy * wz[k - k0]
+
+# Edge length in voxels of the cells particle mass is tallied in to detect
+# which bricks changed between frames.
+COHERENCE_CELL = 4
+
+@njit(cache=True)
+def _deposit_mass(points, spacing, pad, cell, shape):
+    # Cloud-in-cell tally of the particles (relative to the domain origin)
+    # on a coarse grid of `cell`-voxel cells offset by `pad` voxels. The
+    # tally changes continuously with the positions, so jitter far below a
+    # voxel hardly changes it, unlike any hash of the positions.
+    mass = np.zeros((shape[0], shape[1], shape[2]), dtype=np.float64)
+    for q in range(points.shape[0]):
+        i = np.empty(3, dtype=np.int64)
+        f = np.empty(3, dtype=np.float64)
+        inside = True
+        for a in range(3):
+            u = (points[q, a] / spacing + pad) / cell - 0.5
+            i[a] = int(np.floor(u))
+            f[a] = u - i[a]
+            if i[a] < 0 or i[a] + 1 >= shape[a]:
+                inside = False
+        if not inside:
+            continue
+        for dx in range(2):
+            wx = f[0] if dx else 1.0 - f[0]
+            for dy in range(2):
+                wy = f[1] if dy else 1.0 - f[1]
+                for dz in range(2):
+                    wz = f[2] if dz else 1.0 - f[2]
+                    mass[i[0] + dx, i[1] + dy, i[2] + dz] += wx * wy * wz
+    return mass
+
+@njit(parallel=True, cache=True)
+def _brick_mass_blocks(mass, brick_coords, brick_size, half_width, pad, cell, block):
+    # The coarse cells around every voxel a brick is splatted from.
+    blocks = np.empty((brick_coords.shape[0], block, block, block), dtype=np.float32)
+    for b in prange(brick_coords.shape[0]):
+        c0 = (brick_coords[b, 0] * brick_size - half_width + pad) // cell - 1
+        c1 = (brick_coords[b, 1] * brick_size - half_width + pad) // cell - 1
+        c2 = (brick_coords[b, 2] * brick_size - half_width + pad) // cell - 1
+        for i in range(block):
+            for j in range(block):
+                for k in range(block):
+                    blocks[b, i, j, k] = mass[c0 + i, c1 + j, c2 + k]
+    return blocks
+
+def _brick_grid(domain, brick_size):
+    grid_shape = np.array(domain.shape, dtype=np.int64)
+    return grid_shape, (grid_shape + brick_size - 1) // brick_size
+
+def occupied_bricks(points, domain, radius=0.005, brick_size=BRICK_SIZE):
+    grid_shape, _ = _brick_grid(domain, brick_size)
+    half_width = stencil_half_width(radius, domain.spacing)
+    points = np.ascontiguousarray(points)
+    occupied = _mark_bricks(points, np.asarray(domain.origin, dtype=np.float64),
+                            domain.spacing, grid_shape, half_width, brick_size)
+    return np.argwhere(occupied)
+
+def bin_points_by_brick(points, domain, radius=0.005, brick_size=BRICK_SIZE):
+    grid_shape, n_bricks = _brick_grid(domain, brick_size)
+    return _bin_points_by_brick(np.ascontiguousarray(points),
+                                np.asarray(domain.origin, dtype=np.float64), domain.spacing,
+                                grid_shape, stencil_half_width(radius, domain.spacing),
+                                n_bricks, brick_size)
+
+def create_sparse_density_field(points, brick_coords, domain, radius=0.005,
+                                 brick_size=BRICK_SIZE, binned=None):
+    # Density samples of the given bricks, shape (n, brick_size + 1, ...): each
+    # brick also holds the first sample plane of its upper neighbours, so it
+    # can be polygonised on its own. `binned` reuses a previous
+    # `bin_points_by_brick` of the same points.
+    grid_shape, n_bricks = _brick_grid(domain, brick_size)
+    half_width = stencil_half_width(radius, domain.spacing)
+    sigma2 = (radius / 2) ** 2
+    if binned is None:
+        binned = bin_points_by_brick(points, domain, radius, brick_size)
+    sorted_points, cells, starts = binned
+    values = np.zeros((len(brick_coords),) + (brick_size + 1,) * 3, dtype=np.float32)
+    with _splat_lock:
+        _splat_bricks(sorted_points, cells, starts, np.ascontiguousarray(brick_coords, dtype=np.int64),
+                      values, grid_shape, n_bricks, domain.spacing, half_width, brick_size,
+                      radius * radius, 1.0 / (2 * sigma2))
+    return values
+
+def mesh_bricks(brick_coords, values, iso, domain, brick_size=BRICK_SIZE):
+    # Marching cubes on every brick the isosurface passes through; yields the
+    # brick coordinates with its vertices (in grid voxel units) and faces.
+    last_sample = np.array(domain.shape) - 1
+    for coords, brick in zip(brick_coords, values):
+        origin = np.asarray(coords) * brick_size
+        extent = np.minimum(last_sample - origin, brick_size) + 1
+        brick = brick[:extent[0], :extent[1], :extent[2]]
+        if brick.max() < iso or brick.min() > iso:
+            continue
+        verts, faces = mesh_from_field(brick, iso=iso)
+        yield coords, verts + origin.astype(verts.dtype), faces
+
+def stitch_meshes(pieces, brick_size=BRICK_SIZE):
+    # Concatenate per-brick meshes and weld the vertices that neighbouring
+    # bricks both generate on their shared faces. Only vertices lying on a
+    # brick face can be duplicates; they are matched by the grid edge they
+    # lie on, so meshes of bricks built from slightly different particle
+    # positions (see IncrementalMesher) still join without cracks.
+    pieces = list(pieces)
+    if not pieces:
+        return np.empty((0, 3), dtype=np.float32), np.empty((0, 3), dtype=np.int32)
+    offsets = np.cumsum([0] + [len(verts) for verts, _ in pieces[:-1]])
+    index_type = np.int32 if offsets[-1] + len(pieces[-1][0]) < 2**31 else np.int64
+    verts = np.concatenate([verts for verts, _ in pieces])
+    faces = np.concatenate([faces.astype(index_type) + index_type(offset)
+                            for (_, faces), offset in zip(pieces, offsets)])
+    on_face = np.flatnonzero((verts % brick_size == 0).any(axis=1))
+    face_verts = verts[on_face]
+    edge_start = np.floor(face_verts)
+    fractional = face_verts != edge_start
+    edge_axis = np.where(fractional.any(axis=1), fractional.argmax(axis=1), 3)
+    edge_keys = np.column_stack([edge_start.astype(np.int64), edge_axis])
+    _, first, inverse = np.unique(edge_keys, axis=0, return_index=True,
+                                  return_inverse=True)
+    target = np.arange(len(verts), dtype=index_type)
+    target[on_face] = on_face[first][inverse.reshape(-1)]
+    keep = target == np.arange(len(verts), dtype=index_type)
+    new_index = (np.cumsum(keep) - 1).astype(index_type)
+    return verts[keep], new_index[target][faces]
+
+def _mesh_brick_slabs(points, bricks, domain, iso, radius, brick_size, binned, timings):
+    # Splat and polygonise `bricks` one x-slab at a time; returns a
+    # (coords, verts, faces) piece per brick the surface passes through.
+    splat_time = mesh_time = 0.0
+    pieces = []
+    for bx in np.unique(bricks[:, 0]):
+        slab = bricks[bricks[:, 0] == bx]
+        start = time.perf_counter()
+        values = create_sparse_density_field(points, slab, domain, radius,
+                                             brick_size, binned)
+        splat_time += time.perf_counter() - start
+        start = time.perf_counter()
+        pieces.extend(mesh_bricks(slab, values, iso, domain, brick_size))
+        mesh_time += time.perf_counter() - start
+    timings["splat"] = timings.get("splat", 0.0) + splat_time
+    timings["marching cubes"] = timings.get("marching cubes", 0.0) + mesh_time
+    return pieces
+
+def sparse_mesh_from_points(points, iso=0.5, grid_size=500, radius=0.005,
+                            brick_size=BRICK_SIZE, timings=None, domain=None):
+    # Splat and polygonise one x-slab of occupied bricks at a time, so only
+    # bricks near particles are ever allocated and at most one slab of them
+    # is held in memory next to the growing surface mesh. Seconds spent are
+    # added to the "splat" and "marching cubes" entries of `timings`.
+    domain = domain or unit_domain(grid_size)
+    timings = {} if timings is None else timings
+    start = time.perf_counter()
+    bricks = occupied_bricks(points, domain, radius, brick_size)
+    binned = bin_points_by_brick(points, domain, radius, brick_size)
+    timings["splat"] = timings.get("splat", 0.0) + time.perf_counter() - start
+    pieces = _mesh_brick_slabs(points, bricks, domain, iso, radius, brick_size, binned, timings)
+    start = time.perf_counter()
+    mesh = stitch_meshes([(verts, faces) for _, verts, faces in pieces], brick_size)
+    timings["marching cubes"] += time.perf_counter() - start
+    return mesh
+
+class IncrementalMesher:
+    # Meshes consecutive frames on a fixed domain, reusing the brick meshes
+    # of earlier frames. A brick is splatted and polygonised again only when
+    # the particle mass tallied in some COHERENCE_CELL-voxel cell around it
+    # changed by more than `tolerance` particles since it was last built
+    # (0.25 is about one particle moving by one voxel), so still and slowly
+    # moving parts of the flow keep their previous surface.
+
+    def __init__(self, domain, iso=0.5, radius=0.005, brick_size=BRICK_SIZE, tolerance=0.25):
+        self.domain = domain
+        self.iso = iso
+        self.radius = radius
+        self.brick_size = brick_size
+        self.tolerance = tolerance
+        self.half_width = stencil_half_width(radius, domain.spacing)
+        self.pad = self.half_width + 2 * COHERENCE_CELL
+        self.block = -(-(brick_size + 2 * self.half_width + 1) // COHERENCE_CELL) + 3
+        self.mass_shape = np.array([(n + 2 * self.pad) // COHERENCE_CELL + self.block + 2
+                                    for n in domain.shape], dtype=np.int64)
+        self.n_bricks = _brick_grid(domain, brick_size)[1]
+        # Linear brick index -> (mass block, verts, faces), with verts None for
+        # bricks the surface does not pass through.
+        self.bricks = {}
+        self.rebuilt = 0
+
+    def mesh(self, points, timings=None):
+        timings = {} if timings is None else timings
+        start = time.perf_counter()
+        coords = occupied_bricks(points, self.domain, self.radius, self.brick_size)
+        binned = bin_points_by_brick(points, self.domain, self.radius, self.brick_size)
+        mass = _deposit_mass(binned[0], self.domain.spacing, self.pad, COHERENCE_CELL,
+                             self.mass_shape)
+        with _splat_lock:
+            blocks = _brick_mass_blocks(mass, coords, self.brick_size, self.half_width, self.pad,
+                                        COHERENCE_CELL, self.block)
+        ids = ((coords[:, 0] * self.n_bricks[1] + coords[:, 1]) * self.n_bricks[2] + coords[:, 2]).tolist()
+        dirty = np.array([i not in self.bricks or
+                          np.abs(block - self.bricks[i][0]).max() > self.tolerance
+                          for i, block in zip(ids, blocks)], dtype=bool)
+        timings["splat"] = timings.get("splat", 0.0) + time.perf_counter() - start
+
+        built = {}
+        for brick_coords, verts, faces in _mesh_brick_slabs(points, coords[dirty], self.domain,
+                                                            self.iso, self.radius,
+                                                            self.brick_size, binned, timings):
+            built[tuple(brick_coords.tolist())] = (verts, faces)
+        bricks = {}
+        for k, (i, brick_coords) in enumerate(zip(ids, coords.tolist())):
+            if dirty[k]:
+                bricks[i] = (blocks[k],) + built.get(tuple(brick_coords), (None, None))
+            else:
+                bricks[i] = self.bricks[i]
+        self.bricks = bricks
+        self.rebuilt = int(dirty.sum())
+
+        start = time.perf_counter()
+        mesh = stitch_meshes([(verts, faces) for _, verts, faces in bricks.values()
+                              if verts is not None], self.brick_size)
+        timings["marching cubes"] = timings.get("marching cubes", 0.0) + time.perf_counter() - start
+        return mesh
+
+def to_physical(verts, domain):
+    # Grid voxel units -> simulation coordinates.
+    return (verts * domain.spacing + domain.origin).astype(np.float32)
+
+# Rows formatted per `%` call when writing OBJ text, bounding the temporary
+# Python objects.
+OBJ_CHUNK_ROWS = 65536
+
+def _write_rows(f, fmt, rows):
+    for start in range(0, len(rows), OBJ_CHUNK_ROWS):
+        chunk = rows[start:start + OBJ_CHUNK_ROWS]
+        f.write((fmt * len(chunk)) % tuple(chunk.ravel().tolist()))
+
 def save_obj(filename, verts, faces):
+    # Whole blocks of rows are formatted by one `%` call instead of one
+    # f-string per line; %.9g keeps float32 coordinates exact.
     with open(filename, 'w') as f:
-        for v in verts:
-            f.write(f"v {v[0]} {v[1]} {v[2]}\n")
-        for face in faces:
-            f.write(f"f {int(face[0]+1)} {int(face[1]+1)} {int(face[2]+1)}\n")
+        _write_rows(f, "v %.9g %.9g %.9g\n", np.asarray(verts))
+        _write_rows(f, "f %d %d %d\n", np.asarray(faces, dtype=np.int64) + 1)
+
+def save_ply(filename, verts, faces):
+    # Binary little-endian PLY: the vertex and face arrays are dumped as is.
+    verts = np.asarray(verts, dtype="<f4")
+    face_records = np.empty(len(faces), dtype=[("n", "u1"), ("idx", "<i4", (3,))])
+    face_records["n"] = 3
+    face_records["idx"] = faces
+    header = (
+        "ply\n"
+        "format binary_little_endian 1.0\n"
+        f"element vertex {len(verts)}\n"
+        "property float x\nproperty float y\nproperty float z\n"
+        f"element face {len(faces)}\n"
+        "property list uchar int vertex_indices\n"
+        "end_header\n"
+    )
+    with open(filename, 'wb') as f:
+        f.write(header.encode("ascii"))
+        verts.tofile(f)
+        face_records.tofile(f)
+
+def save_glb(filename, verts, faces):
+    # Binary glTF 2.0 with positions quantised to 16-bit integers
+    # (KHR_mesh_quantization); the node transform maps them back to grid
+    # coordinates, to within 1/65535 of the mesh extent.
+    verts = np.asarray(verts, dtype=np.float64)
+    if len(verts):
+        low, high = verts.min(axis=0), verts.max(axis=0)
+    else:
+        low = high = np.zeros(3)
+    scale = np.maximum(high - low, 1e-12) / 65535
+    # Vertex attributes must be 4-byte aligned, so positions are padded to
+    # four components.
+    positions = np.zeros((len(verts), 4), dtype="<u2")
+    positions[:, :3] = np.rint((verts - low) / scale)
+    index_type, component = ("<u2", 5123) if len(verts) <= 65535 else ("<u4", 5125)
+    indices = np.asarray(faces, dtype=index_type).ravel()
+    index_bytes = indices.tobytes() + b"\0" * (-indices.nbytes % 4)
+    binary = positions.tobytes() + index_bytes
+
+    gltf = {
+        "asset": {"version": "2.0", "generator": "vtk_to_obj.py"},
+        "extensionsUsed": ["KHR_mesh_quantization"],
+        "extensionsRequired": ["KHR_mesh_quantization"],
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"mesh": 0, "translation": low.tolist(), "scale": scale.tolist()}],
+        "meshes": [{"primitives": [{"attributes": {"POSITION": 0}, "indices": 1}]}],
+        "buffers": [{"byteLength": len(binary)}],
+        "bufferViews": [
+            {"buffer": 0, "byteOffset": 0, "byteLength": positions.nbytes,
+             "byteStride": 8, "target": 34962},
+            {"buffer": 0, "byteOffset": positions.nbytes, "byteLength": indices.nbytes,
+             "target": 34963},
+        ],
+        "accessors": [
+            {"bufferView": 0, "componentType": 5123, "count": len(verts), "type": "VEC3",
+             "min": [0, 0, 0], "max": np.rint((high - low) / scale).astype(int).tolist()},
+            {"bufferView": 1, "componentType": component, "count": indices.size,
+             "type": "SCALAR"},
+        ],
+    }
+    json_bytes = json.dumps(gltf, separators=(",", ":")).encode()
+    json_bytes += b" " * (-len(json_bytes) % 4)
+    with open(filename, 'wb') as f:
+        f.write(struct.pack("<III", 0x46546C67, 2, 12 + 8 + len(json_bytes) + 8 + len(binary)))
+        f.write(struct.pack("<II", len(json_bytes), 0x4E4F534A))
+        f.write(json_bytes)
+        f.write(struct.pack("<II", len(binary), 0x004E4942))
+        f.write(binary)
+
+# Output format -> (file extension, writer).
+MESH_WRITERS = {
+    "obj": (".obj", save_obj),
+    "ply": (".ply", save_ply),
+    "glb": (".glb", save_glb),
+}
+
+STAGES = ("read", "splat", "marching cubes", "write")
+
+BOUNDS_MODES = ("unit", "frame", "global")
 
-def process_file(vtk_file, out_dir, iso, grid_size, radius):
+def process_file(vtk_file, out_dir, iso, grid_size, radius, brick_size=BRICK_SIZE, mesh_format="obj",
+                 bounds="unit", voxel_size=None, global_bounds=None, mesher=None,
+                 particle_types=PARTICLE_TYPES):
+    # Returns the seconds spent in each of STAGES, or None on failure. With an
+    # IncrementalMesher, its domain is used and its brick meshes are reused.
+    timings = dict.fromkeys(STAGES, 0.0)
     try:
         print(f"[START] Processing {vtk_file}")
-        points = vtk_to_points(vtk_file)
-        field = create_density_field(points, grid_size=grid_size, radius=radius)
-        verts, faces = mesh_from_field(field, iso=iso)
+        start = time.perf_counter()
+        points = read_points(vtk_file, particle_types)
+        timings["read"] = time.perf_counter() - start
+        reuse = ""
+        if mesher is not None:
+            domain = mesher.domain
+        elif bounds == "unit":
+            domain = unit_domain(grid_size)
+        else:
+            low, high = global_bounds if bounds == "global" else points_bounds(points)
+            domain = domain_from_bounds(low, high, radius, grid_size, voxel_size)
+        if mesher is not None:
+            verts, faces = mesher.mesh(points, timings=timings)
+            reuse = f"rebuilt {mesher.rebuilt} of {len(mesher.bricks)} bricks; "
+        elif brick_size:
+            verts, faces = sparse_mesh_from_points(points, iso=iso, radius=radius,
+                                                   brick_size=brick_size, timings=timings,
+                                                   domain=domain)
+        else:
+            start = time.perf_counter()
+            field = create_density_field(points, radius=radius, domain=domain)
+            timings["splat"] = time.perf_counter() - start
+            start = time.perf_counter()
+            verts, faces = mesh_from_field(field, iso=iso)
+            timings["marching cubes"] = time.perf_counter() - start
+            del field
+        if bounds != "unit":
+            verts = to_physical(verts, domain)
         frame_id = os.path.splitext(os.path.basename(vtk_file))[0]
-        save_obj(os.path.join(out_dir, f"{frame_id}.obj"), verts, faces)
-        print(f"[DONE] {vtk_file} → mesh")
+        start = time.perf_counter()
+        extension, writer = MESH_WRITERS[mesh_format]
+        writer(os.path.join(out_dir, f"{frame_id}{extension}"), verts, faces)
+        timings["write"] = time.perf_counter() - start
+        grid = "x".join(str(n) for n in domain.shape)
+        print(f"[DONE] {vtk_file} → mesh ({grid} voxels of {domain.spacing:.4g}; "
+              f"{reuse}{_format_timings(timings)})")
+        return timings
     except Exception as e:
         print(f"[ERROR] Failed to process {vtk_file}: {e}")
+        return None
 
-def convert_vtk_dir_to_meshes(vtk_dir, out_dir, iso=0.5, grid_size=500, radius=0.005, max_workers=None, prefix="PartStructure"):
+def process_sequence(vtk_files, out_dir, iso, grid_size, radius, brick_size=BRICK_SIZE, mesh_format="obj",
+                     bounds="unit", voxel_size=None, global_bounds=None, tolerance=0.25,
+                     particle_types=PARTICLE_TYPES):
+    # Mesh consecutive frames in order with one IncrementalMesher, so each
+    # frame only rebuilds the bricks whose particles moved.
+    if bounds not in ("unit", "global"):
+        raise ValueError(f"Incremental meshing needs a fixed domain (bounds 'unit' or 'global'), not {bounds!r}")
+    if bounds == "global":
+        domain = domain_from_bounds(*global_bounds, radius, grid_size, voxel_size)
+    else:
+        domain = unit_domain(grid_size)
+    mesher = IncrementalMesher(domain, iso, radius, brick_size, tolerance)
+    return [process_file(vtk_file, out_dir, iso, grid_size, radius, brick_size, mesh_format,
+                         bounds, voxel_size, global_bounds, mesher, particle_types)
+            for vtk_file in vtk_files]
+
+def _format_timings(timings):
+    return ", ".join(f"{stage} {timings[stage]:.2f} s" for stage in STAGES)
+
+def available_memory():
+    # Bytes of RAM available to new work, including reclaimable page cache.
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+
+def frame_memory_estimate(vtk_file, grid_shape, brick_size=BRICK_SIZE):
+    # Rough peak bytes of one frame: VTK keeps the whole file in memory next
+    # to the point copies (for files it has to parse), plus the dense grid or
+    # one slab of bricks.
+    nx, ny, nz = grid_shape
+    if brick_size:
+        grid_bytes = -(-ny // brick_size) * -(-nz // brick_size) * (brick_size + 1) ** 3 * 4
+    else:
+        grid_bytes = nx * ny * nz * 4
+    return grid_bytes + 3 * os.path.getsize(vtk_file)
+
+def max_frames_in_flight(vtk_files, grid_shape, brick_size=BRICK_SIZE, memory_fraction=0.8):
+    # How many frames fit in the available RAM at once.
+    if not vtk_files:
+        return 1
+    per_frame = max(frame_memory_estimate(f, grid_shape, brick_size) for f in vtk_files)
+    return max(int(available_memory() * memory_fraction // per_frame), 1)
+
+BOUNDS_CACHE = "bounds.json"
+
+def frame_bounds(vtk_file, particle_types=PARTICLE_TYPES):
+    low, high = points_bounds(read_points(vtk_file, particle_types))
+    return low.tolist(), high.tolist()
+
+def sequence_bounds(vtk_files, out_dir, max_workers=4, particle_types=PARTICLE_TYPES):
+    # Union of the particle bounding boxes of all frames. Per-frame boxes are
+    # cached in <out_dir>/bounds.json by file size and mtime (and the selected
+    # particle types of .bi4 files), so re-runs only read new or changed frames.
+    cache_file = os.path.join(out_dir, BOUNDS_CACHE)
+    try:
+        with open(cache_file) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+
+    def stamp(vtk_file):
+        st = os.stat(vtk_file)
+        if vtk_file.endswith(".bi4"):
+            return [st.st_size, st.st_mtime_ns, sorted(particle_types)]
+        return [st.st_size, st.st_mtime_ns]
+
+    missing = [f for f in vtk_files
+               if cache.get(os.path.basename(f), {}).get("stamp") != stamp(f)]
+    if missing:
+        print(f"[INFO] Scanning bounds of {len(missing)} of {len(vtk_files)} frames")
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for vtk_file, (low, high) in zip(missing, pool.map(frame_bounds, missing, [particle_types] * len(missing))):
+                cache[os.path.basename(vtk_file)] = {"stamp": stamp(vtk_file),
+                                                     "low": low, "high": high}
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp_file, cache_file)
+
+    entries = [cache[os.path.basename(f)] for f in vtk_files]
+    return (np.min([e["low"] for e in entries], axis=0),
+            np.max([e["high"] for e in entries], axis=0))
+
+def _init_worker(numba_threads):
+    import numba
+    numba.set_num_threads(numba_threads)
+
+def convert_vtk_dir_to_meshes(vtk_dir, out_dir, iso=0.5, grid_size=500, radius=0.005, max_workers=None, prefix="PartStructure", brick_size=BRICK_SIZE, executor="thread", mesh_format="obj", bounds="unit", voxel_size=None, incremental=False, tolerance=0.25, particle_types=PARTICLE_TYPES):
+    if incremental and bounds not in ("unit", "global"):
+        raise ValueError(f"Incremental meshing needs a fixed domain (bounds 'unit' or 'global'), not {bounds!r}")
     os.makedirs(out_dir, exist_ok=True)
     vtk_files = [
         os.path.join(vtk_dir, file)
         for file in sorted(os.listdir(vtk_dir))
-        if file.endswith('.vtk') and file.startswith(prefix)
+        if file.endswith(PARTICLE_EXTENSIONS) and file.startswith(prefix)
     ]
 
     if max_workers is None:
         max_workers = os.cpu_count() or 4
 
-    def task(vtk_file):
-        process_file(vtk_file, out_dir, iso, grid_size, radius)
+    global_bounds = None
+    grid_shape = (grid_size,) * 3
+    if bounds == "global" and vtk_files:
+        global_bounds = sequence_bounds(vtk_files, out_dir, max_workers, particle_types)
+        domain = domain_from_bounds(*global_bounds, radius, grid_size, voxel_size)
+        grid_shape = domain.shape
+        print(f"[INFO] Global domain {np.round(global_bounds[0], 4).tolist()} – "
+              f"{np.round(global_bounds[1], 4).tolist()}, "
+              f"{'x'.join(str(n) for n in grid_shape)} voxels of {domain.spacing:.4g}")
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [executor.submit(task, file) for file in vtk_files]
-        for future in futures:
-            future.result()
+    in_flight = max_frames_in_flight(vtk_files, grid_shape, brick_size)
+    if in_flight < max_workers:
+        print(f"[INFO] Limiting to {in_flight} frame(s) at a time to fit in "
+              f"{available_memory() / 1e9:.1f} GB of available memory")
+        max_workers = in_flight
+
+    if executor == "process":
+        # Each process runs its own numba kernels, so the cores are shared
+        # out instead of every worker starting one thread per core.
+        pool = ProcessPoolExecutor(max_workers=max_workers,
+                                   mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_init_worker,
+                                   initargs=(max((os.cpu_count() or 1) // max_workers, 1),))
+    else:
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+
+    start = time.perf_counter()
+    with pool:
+        if incremental:
+            # Every worker meshes one contiguous run of frames in order.
+            chunks = [chunk.tolist() for chunk in np.array_split(vtk_files, max_workers) if len(chunk)]
+            futures = [pool.submit(process_sequence, chunk, out_dir, iso, grid_size, radius, brick_size,
+                                   mesh_format, bounds, voxel_size, global_bounds, tolerance,
+                                   particle_types)
+                       for chunk in chunks]
+            results = [timings for future in futures for timings in future.result()]
+        else:
+            futures = [pool.submit(process_file, file, out_dir, iso, grid_size, radius, brick_size, mesh_format,
+                                   bounds, voxel_size, global_bounds, None, particle_types)
+                       for file in vtk_files]
+            results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+
+    done = [timings for timings in results if timings is not None]
+    totals = {stage: sum(timings[stage] for timings in done) for stage in STAGES}
+    print(f"[SUMMARY] {len(done)} of {len(vtk_files)} frames in {elapsed:.1f} s with "
+          f"{max_workers} {executor} worker(s); total per stage: {_format_timings(totals)}")
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Convert .vtk files to mesh .obj files.")
-    parser.add_argument("vtk_dir", help="Path to input directory containing .vtk files")
-    parser.add_argument("out_dir", help="Path to output directory for .obj meshes")
+    parser = argparse.ArgumentParser(description="Convert .vtk (partvtk) or .bi4 (DualSPHysics) particle files to .obj/.ply/.glb meshes.")
+    parser.add_argument("vtk_dir", help="Path to input directory containing .vtk files, or the .bi4 data directory of a run (e.g. with --prefix Part)")
+    parser.add_argument("out_dir", help="Path to output directory for the meshes")
     parser.add_argument("--iso", type=float, default=0.5, help="Isosurface threshold for marching cubes")
-    parser.add_argument("--prefix", type=str, default="PartStructure", help="Filename prefix filter for .vtk files (default: PartStructure)")
-    parser.add_argument("--grid-size", type=int, default=500, help="Grid resolution for the density field")
+    parser.add_argument("--prefix", type=str, default="PartStructure", help="Filename prefix filter for .vtk/.bi4 files (default: PartStructure)")
+    parser.add_argument("--onlytype", default="-all,+fluid", help="Particle types meshed from .bi4 files, as partvtk's -onlytype, e.g. --onlytype=+all or --onlytype=-all,+fluid,+floating (default: -all,+fluid)")
+    parser.add_argument("--grid-size", type=int, default=500, help="Grid resolution for the density field (voxels along the longest axis with --bounds frame/global)")
+    parser.add_argument("--bounds", choices=BOUNDS_MODES, default="unit", help="Density grid domain: the unit cube [0,1)^3 with meshes in voxel units (legacy), or fitted around the particles of each frame or of the whole sequence, with meshes in simulation coordinates (default: unit)")
+    parser.add_argument("--voxel-size", type=float, default=None, help="Voxel edge length in simulation units with --bounds frame/global; voxel counts per axis follow from the domain extent (overrides --grid-size)")
     parser.add_argument("--radius", type=float, default=0.005, help="Influence radius for point density")
-    parser.add_argument("--max-workers", type=int, default=None, help="Maximum number of parallel threads (default: CPU count)")
+    parser.add_argument("--brick-size", type=int, default=BRICK_SIZE, help="Edge length in voxels of the bricks of the sparse density grid; 0 allocates the full dense grid")
+    parser.add_argument("--incremental", action="store_true", help="Reuse the brick meshes of the previous frame and only rebuild bricks whose particles moved; each worker meshes a contiguous run of frames (needs the sparse grid and --bounds unit or global)")
+    parser.add_argument("--coherence-tolerance", type=float, default=0.25, help="With --incremental, change of the particle mass around a brick, in particles, below which its previous mesh is kept; 0.25 is about one particle moving by one voxel (default: 0.25)")
+    parser.add_argument("--max-workers", type=int, default=None, help="Maximum number of parallel workers (default: CPU count, lowered to what fits in available memory)")
+    parser.add_argument("--format", choices=sorted(MESH_WRITERS), default="obj", help="Mesh file format: text OBJ, binary little-endian PLY, or glTF binary with 16-bit quantised positions, for viewers supporting KHR_mesh_quantization (default: obj)")
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread", help="Run frames in threads or in separate processes (default: thread)")
 
     args = parser.parse_args()
+    if args.incremental and (args.brick_size == 0 or args.bounds == "frame"):
+        parser.error("--incremental needs the sparse grid (--brick-size > 0) and a fixed domain (--bounds unit or global)")
+    if args.coherence_tolerance <= 0:
+        parser.error("--coherence-tolerance must be positive")
+    try:
+        particle_types = parse_onlytype(args.onlytype)
+    except ValueError as e:
+        parser.error(f"--onlytype: {e}")
 
     convert_vtk_dir_to_meshes(
         args.vtk_dir,
@@ -100,5 +989,13 @@ if __name__ == "__main__":
         grid_size=args.grid_size,
         radius=args.radius,
         max_workers=args.max_workers,
-        prefix=args.prefix
+        prefix=args.prefix,
+        brick_size=args.brick_size,
+        executor=args.executor,
+        mesh_format=args.format,
+        bounds=args.bounds,
+        voxel_size=args.voxel_size,
+        incremental=args.incremental,
+        tolerance=args.coherence_tolerance,
+        particle_types=particle_types
     )
\ No newline at end of file
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the XBeach animator on synthetic grids.
+
+Usage:
+    python benchmarks.py animation --nx 1000 --ny 1000 --frames 30
+    python benchmarks.py points --nx 2000 --ny 1000 --frames 20
+"""
+
+import argparse
+import time
+import tracemalloc
+import numpy as np
+import pyvista as pv
+from visualization import (_add_wave_mesh, _build_structured_grid,
+                           _set_camera, iterate_time_steps,
+                           iterate_time_steps_into, prepare_point_clouds,
+                           update_wave_mesh)
+
+
+def _synthetic_run(nx: int, ny: int, frames: int):
+    """Build a sloping beach with a travelling wave, shaped like XBeach."""
+    x = np.linspace(0.0, 2000.0, nx)
+    y = np.linspace(0.0, 1000.0, ny)
+    X, Y = np.meshgrid(x, y)
+    Zb = -10.0 + X / 100.0
+    Zs = Zb.clip(min=0)
+    phase = np.linspace(0.0, 2 * np.pi, frames, endpoint=False)
+    H = np.stack([1.0 + 0.5 * np.sin(X / 50.0 + p) for p in phase])
+    return X, Y, Zb, Zs, H
+
+
+def benchmark_animation(nx: int = 1000, ny: int = 1000, frames: int = 30):
+    """
+    Compare the render loop of `animate_wave` with in-place point updates
+    against the previous remove/re-add actor path. Encoding is left out so
+    only the per-frame scene update and render are timed.
+    """
+    X, Y, Zb, Zs, H = _synthetic_run(nx, ny, frames)
+    pc = prepare_point_clouds(X, Y, Zb, Zs, H[0])
+    cmap = "Blues"
+
+    print(f"Animation render loop, {nx}x{ny} grid, {frames} frames")
+    for in_place in (False, True):
+        seabed = _build_structured_grid(pc.bed_points, pc.grid_dimensions,
+                                        "elevation")
+        wave = _build_structured_grid(pc.wave_points.copy(),
+                                      pc.grid_dimensions, "wave")
+        plotter = pv.Plotter(off_screen=True, window_size=(1200, 800))
+        plotter.add_mesh(seabed, scalars="elevation", show_scalar_bar=False)
+        actor = _add_wave_mesh(plotter, wave, cmap)
+        _set_camera(plotter, (30, -45))
+        plotter.render()
+
+        start = time.perf_counter()
+        for pts in iterate_time_steps(pc, Zs, H):
+            if in_place:
+                update_wave_mesh(wave, pts)
+            else:
+                wave.points = pts
+                plotter.remove_actor(actor)
+                actor = _add_wave_mesh(plotter, wave, cmap)
+            plotter.render()
+        elapsed = time.perf_counter() - start
+        plotter.close()
+
+        label = "in-place update" if in_place else "rebuild actor"
+        print(f"  {label:<16} {frames / elapsed:8.2f} frames/s "
+              f"({1000 * elapsed / frames:.1f} ms/frame)")
+
+
+def _time_and_trace(frames, num_frames: int) -> tuple[float, float]:
+    """
+    Return (seconds per frame, peak MB newly allocated per frame). The
+    first frame is excluded from the allocation peak so one-off buffer
+    setup is not counted as a per-frame cost.
+    """
+    frames = iter(frames)
+    tracemalloc.start()
+    start = time.perf_counter()
+    peak = 0
+    for t in range(num_frames):
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        next(frames)
+        if t > 0:
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+    return elapsed / num_frames, peak / 1e6
+
+
+def benchmark_points(nx: int = 2000, ny: int = 1000, frames: int = 20):
+    """
+    Compare per-frame time and allocations of `iterate_time_steps` against
+    the preallocated-buffer `iterate_time_steps_into` variant.
+    """
+    X, Y, Zb, Zs, H = _synthetic_run(nx, ny, frames)
+    pc = prepare_point_clouds(X, Y, Zb, Zs, H[0])
+
+    variants = {
+        "new array/frame": lambda: iterate_time_steps(pc, Zs, H),
+        "buffer float64": lambda: iterate_time_steps_into(pc, Zs, H),
+        "buffer float32": lambda: iterate_time_steps_into(
+            pc, Zs, H, dtype=np.float32),
+    }
+
+    print(f"Wave point generation, {nx}x{ny} grid, {frames} frames")
+    for label, make_frames in variants.items():
+        seconds, peak_mb = _time_and_trace(make_frames(), frames)
+        print(f"  {label:<16} {1000 * seconds:8.2f} ms/frame "
+              f"{peak_mb:10.1f} MB peak allocated/frame")
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = p.add_subparsers(dest="benchmark", required=True)
+
+    anim = sub.add_parser("animation",
+                          help="Frames/s of the animate_wave render loop.")
+    anim.add_argument("--nx", type=int, default=1000)
+    anim.add_argument("--ny", type=int, default=1000)
+    anim.add_argument("--frames", type=int, default=30)
+
+    points = sub.add_parser(
+        "points", help="Time and allocations of wave point generation.")
+    points.add_argument("--nx", type=int, default=2000)
+    points.add_argument("--ny", type=int, default=1000)
+    points.add_argument("--frames", type=int, default=20)
+
+    args = p.parse_args()
+    if args.benchmark == "animation":
+        benchmark_animation(args.nx, args.ny, args.frames)
+    elif args.benchmark == "points":
+        benchmark_points(args.nx, args.ny, args.frames)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,50 @@
 import numpy as np
 import xarray as xr
 from matplotlib.colors import LinearSegmentedColormap, TwoSlopeNorm
+from field_stats import get_field_statistics
 
 
-def open_netcdf_file(netcdf_file: str) -> xr.Dataset:
+# Chunking used in streaming mode: one output step per dask chunk, so that
+# wave-height slices are read from disk only when a frame asks for them.
+STREAMING_CHUNKS = {"globaltime": 1}
+
+
+def open_netcdf_file(netcdf_file: str, streaming: bool = False) -> xr.Dataset:
+    """
+    Open an XBeach netcdf output file.
+
+    When `streaming` is set, variables are backed by dask arrays chunked
+    along `globaltime`, so time slices are only read on demand.
+    """
     try:
+        if streaming:
+            return xr.open_dataset(netcdf_file, chunks=STREAMING_CHUNKS)
         return xr.open_dataset(netcdf_file)
     except Exception as e:
         raise ValueError(f"Error opening netcdf file {netcdf_file}: {e}")
 
 
+def select_time_window(ds: xr.Dataset,
+                       t_start: float | None = None,
+                       t_end: float | None = None,
+                       t_stride: int = 1) -> xr.Dataset:
+    """
+    Restrict `ds` to the output steps with `t_start <= globaltime <= t_end`
+    (in seconds, both optional), keeping every `t_stride`-th step.
+
+    Selection is lazy: nothing is read from disk until values are accessed,
+    and then only the selected time steps are read.
+    """
+    if t_stride < 1:
+        raise ValueError(f"t_stride must be >= 1, got {t_stride}")
+    selected = ds.sel(globaltime=slice(t_start, t_end)).isel(
+        globaltime=slice(None, None, t_stride))
+    if selected.sizes["globaltime"] == 0:
+        raise ValueError(f"No output steps between t_start={t_start} and "
+                         f"t_end={t_end}.")
+    return selected
+
+
 def _get_terrain_and_ocean_colormaps(Zmin, Zmax):
     seabed_cmap = LinearSegmentedColormap(
         "black_to_dirt", {
@@ -35,18 +70,54 @@ def _get_terrain_and_ocean_colormaps(Zmin, Zmax):
     }
 
 
-def get_simulation_variables(ds: xr.Dataset, stride: int = 1) -> dict:
-    X = ds["globalx"].values[::stride, ::stride]
-    Y = ds["globaly"].values[::stride, ::stride]
+def reduce_grid(da: xr.DataArray, stride: int = 1,
+                coarsen: int = 1) -> xr.DataArray:
+    """
+    Spatially reduce the two trailing (y, x) dimensions of `da`: keep every
+    `stride`-th point, then average non-overlapping `coarsen` x `coarsen`
+    blocks (NaN-aware, trailing partial blocks dropped).
+
+    Block averaging preserves the mean surface, unlike plain striding, which
+    aliases short waves. The result stays lazy for dask-backed arrays.
+    """
+    da = da[..., ::stride, ::stride]
+    if coarsen > 1:
+        da = da.coarsen({dim: coarsen for dim in da.dims[-2:]},
+                        boundary="trim").mean()
+    return da
+
+
+def get_wave_heights(ds: xr.Dataset, stride: int = 1, coarsen: int = 1):
+    """
+    Spatially reduced wave heights H, as a numpy array, or as a lazy
+    DataArray for streaming datasets, whose frames are then read one at a
+    time as they are consumed.
+    """
+    H = reduce_grid(ds["H"], stride, coarsen)
+    if ds["H"].chunks is None:
+        H = H.values
+    return H
+
+
+def get_simulation_variables(ds: xr.Dataset,
+                             stride: int = 1,
+                             coarsen: int = 1) -> dict:
+    # Index before reading, so only the strided hyperslab leaves the file.
+    X = reduce_grid(ds["globalx"], stride, coarsen).values
+    Y = reduce_grid(ds["globaly"], stride, coarsen).values
 
-    Zb = ds["zb"].isel(globaltime=0).values[::stride, ::stride]
+    Zb = reduce_grid(ds["zb"].isel(globaltime=0), stride, coarsen).values
     Zs = Zb.clip(min=0)
 
-    H = ds["H"].values[:, ::stride, ::stride]
+    H = get_wave_heights(ds, stride, coarsen)
 
     times = ds["globaltime"].values
 
-    Zmin, Zmax = Zb.min(), (Zb + np.nanmax(H)).max()
+    # Colour bounds come from a cached streaming reduction, so H never has
+    # to be fully in memory to normalise the colormaps. Coarsened grids use
+    # the matching stride, which is plenty for colour bounds.
+    stats = get_field_statistics(ds, stride=stride * coarsen)
+    Zmin, Zmax = Zb.min(), (Zb + stats["global"]["H"]["nanmax"]).max()
 
     return {
         "X": X,
@@ -57,5 +128,6 @@ def get_simulation_variables(ds: xr.Dataset, stride: int = 1) -> dict:
         "times": times,
         "Zmin": Zmin,
         "Zmax": Zmax,
+        "stats": stats,
         **_get_terrain_and_ocean_colormaps(Zmin, Zmax)
     }
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import pathlib
+import numpy as np
+
+# Bytes hashed from each end of the NetCDF file to fingerprint its content.
+FINGERPRINT_BLOCK = 4 * 1024 * 1024
+SOURCES_INDEX = "sources.json"
+
+
+def get_cache_dir() -> pathlib.Path:
+    """
+    Directory of the derived-product cache: $XBEACH_ANIMATOR_CACHE_DIR, or
+    ~/.cache/xbeach_animator by default.
+    """
+    env_dir = os.environ.get("XBEACH_ANIMATOR_CACHE_DIR")
+    if env_dir:
+        return pathlib.Path(env_dir)
+    return pathlib.Path.home() / ".cache" / "xbeach_animator"
+
+
+def netcdf_fingerprint(nc_file: str) -> str:
+    """
+    Partial content fingerprint of a NetCDF file: SHA-256 of its size and
+    mtime plus its first and last `FINGERPRINT_BLOCK` bytes. The middle of
+    the file is not hashed, so multi-GB outputs are never read in full; the
+    mtime catches reruns that keep the size (XBeach preallocates fixed-size
+    variables) and only differ there, at the cost of a miss when an
+    unchanged file is merely copied or touched.
+    """
+    digest = hashlib.sha256()
+    st = os.stat(nc_file)
+    digest.update(f"{st.st_size}:{st.st_mtime_ns}".encode())
+    with open(nc_file, "rb") as f:
+        digest.update(f.read(FINGERPRINT_BLOCK))
+        if st.st_size > FINGERPRINT_BLOCK:
+            f.seek(max(st.st_size - FINGERPRINT_BLOCK, FINGERPRINT_BLOCK))
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _entry_path(nc_file: str, params: dict) -> pathlib.Path:
+    key = json.dumps({
+        "netcdf": netcdf_fingerprint(nc_file),
+        **params
+    },
+                     sort_keys=True)
+    name = hashlib.sha256(key.encode()).hexdigest()
+    return get_cache_dir() / f"{name}.npz"
+
+
+def load_derived_products(nc_file: str | None, params: dict) -> dict | None:
+    """
+    Return the products cached for `nc_file` and `params` (e.g. stride and
+    vertical fraction), or None on a cache miss.
+    """
+    if not nc_file or not os.path.isfile(nc_file):
+        return None
+    entry = _entry_path(nc_file, params)
+    if not entry.exists():
+        return None
+    try:
+        with np.load(entry) as data:
+            return {name: data[name] for name in data.files}
+    except (OSError, ValueError):
+        return None
+
+
+def save_derived_products(nc_file: str | None, params: dict,
+                          products: dict) -> None:
+    """Store `products` (arrays and scalars) for `nc_file` and `params`."""
+    if not nc_file or not os.path.isfile(nc_file):
+        return
+    entry = _entry_path(nc_file, params)
+    tmp_file = entry.with_name(f"{entry.stem}.{os.getpid()}.tmp.npz")
+    try:
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(tmp_file, **products)
+        os.replace(tmp_file, entry)
+    except OSError as e:
+        print(f"  • Could not write derived-product cache {entry}: {e}")
+
+
+def lookup_source(source_key: str) -> pathlib.Path | None:
+    """
+    Return the NetCDF file remembered for a simulation source (results dir,
+    input/output dirs or task ID), if it still exists.
+    """
+    index_file = get_cache_dir() / SOURCES_INDEX
+    try:
+        with open(index_file, "r") as f:
+            nc_file = json.load(f).get(source_key)
+    except (OSError, ValueError):
+        return None
+    if nc_file and os.path.isfile(nc_file):
+        return pathlib.Path(nc_file)
+    return None
+
+
+def remember_source(source_key: str, nc_file: pathlib.Path) -> None:
+    """Remember the resolved NetCDF file of a simulation source."""
+    index_file = get_cache_dir() / SOURCES_INDEX
+    index = {}
+    try:
+        with open(index_file, "r") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        pass
+    index[source_key] = str(nc_file)
+    tmp_file = index_file.with_name(f"{index_file.name}.{os.getpid()}.tmp")
+    try:
+        index_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_file, "w") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_file, index_file)
+    except OSError as e:
+        print(f"  • Could not write source index {index_file}: {e}")
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import math
+import os
+import pathlib
+import warnings
+import numpy as np
+import xarray as xr
+
+STATS_VARIABLES = ("H", "zs", "zb")
+DEFAULT_PERCENTILES = (1.0, 5.0, 50.0, 95.0, 99.0)
+# Upper bound on the number of values kept to estimate global percentiles.
+MAX_PERCENTILE_SAMPLES = 1_000_000
+SIDECAR_SUFFIX = ".stats.json"
+
+
+def _frame_statistics(frame: np.ndarray,
+                      percentiles: tuple[float, ...]) -> dict:
+    with warnings.catch_warnings():
+        # All-NaN frames (e.g. dry cells only) are expected, not an error.
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        return {
+            "min": float(np.nanmin(frame)),
+            "max": float(np.max(frame)),
+            "nanmax": float(np.nanmax(frame)),
+            "percentiles": np.nanpercentile(frame, percentiles).tolist(),
+        }
+
+
+def compute_field_statistics(
+        ds: xr.Dataset,
+        stride: int = 1,
+        variables: tuple[str, ...] = STATS_VARIABLES,
+        percentiles: tuple[float, ...] = DEFAULT_PERCENTILES) -> dict:
+    """
+    Compute global and per-frame statistics of the given variables in a
+    single pass over the time axis, reading one time step at a time.
+
+    Per-frame min, max, nanmax and percentiles are exact. Global min, max
+    and nanmax are reduced from the per-frame values; global percentiles
+    are estimated from a fixed-size random sample of finite values, so
+    memory stays bounded regardless of the run length.
+
+    Parameters:
+        ds (xr.Dataset): XBeach netcdf dataset.
+        stride (int): spatial stride applied to each frame.
+        variables (tuple[str, ...]): variables to reduce; variables not
+        present in the dataset are skipped.
+        percentiles (tuple[float, ...]): percentiles to compute, in [0, 100].
+
+    Returns:
+        dict: {"frames", "percentiles", "global": {var: stats},
+        "per_frame": {var: {stat: list}}}.
+    """
+    names = [name for name in variables if name in ds]
+    num_frames = ds.sizes["globaltime"]
+    samples_per_frame = math.ceil(MAX_PERCENTILE_SAMPLES / max(num_frames, 1))
+    rng = np.random.default_rng(0)
+
+    per_frame = {
+        name: {
+            "min": [],
+            "max": [],
+            "nanmax": [],
+            "percentiles": []
+        } for name in names
+    }
+    samples = {name: [] for name in names}
+
+    for t in range(num_frames):
+        for name in names:
+            da = ds[name]
+            if "globaltime" in da.dims:
+                da = da.isel(globaltime=t)
+            elif t > 0:
+                continue
+            frame = np.asarray(da[..., ::stride, ::stride].values,
+                               dtype=np.float64)
+
+            for key, value in _frame_statistics(frame, percentiles).items():
+                per_frame[name][key].append(value)
+
+            finite = frame[np.isfinite(frame)]
+            if finite.size > samples_per_frame:
+                finite = rng.choice(finite, samples_per_frame, replace=False)
+            samples[name].append(finite)
+
+    global_stats = {}
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        for name in names:
+            sample = np.concatenate(samples[name])
+            global_stats[name] = {
+                "min": float(np.nanmin(per_frame[name]["min"])),
+                "max": float(np.max(per_frame[name]["max"])),
+                "nanmax": float(np.nanmax(per_frame[name]["nanmax"])),
+                "percentiles": (np.percentile(sample, percentiles).tolist()
+                                if sample.size else [math.nan] *
+                                len(percentiles)),
+            }
+
+    return {
+        "frames": num_frames,
+        "percentiles": list(percentiles),
+        "global": global_stats,
+        "per_frame": per_frame,
+    }
+
+
+def _source_key(path: pathlib.Path) -> dict:
+    st = path.stat()
+    return {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+
+def get_field_statistics(
+        ds: xr.Dataset,
+        stride: int = 1,
+        variables: tuple[str, ...] = STATS_VARIABLES,
+        percentiles: tuple[float, ...] = DEFAULT_PERCENTILES) -> dict:
+    """
+    Same as `compute_field_statistics`, but cached in a sidecar JSON file
+    next to the netcdf file (`<file>.stats.json`). The cache is keyed by
+    the file's mtime and size, so re-runs on unchanged output skip the scan.
+    Entries are also keyed by the selected `globaltime` values, so time
+    windows of the same file are cached separately.
+    """
+    source = ds.encoding.get("source")
+    if not source or not os.path.isfile(source):
+        return compute_field_statistics(ds, stride, variables, percentiles)
+
+    # Resolve symlinks so the sidecar outlives the combined symlink tree.
+    nc_path = pathlib.Path(source).resolve()
+    sidecar = nc_path.with_name(nc_path.name + SIDECAR_SUFFIX)
+    source_key = _source_key(nc_path)
+    times_digest = hashlib.sha1(
+        np.ascontiguousarray(ds["globaltime"].values).tobytes()).hexdigest()
+    entry_key = json.dumps({
+        "times": times_digest,
+        "stride": stride,
+        "variables": list(variables),
+        "percentiles": list(percentiles),
+    },
+                           sort_keys=True)
+
+    cache = {"source": source_key, "entries": {}}
+    if sidecar.exists():
+        try:
+            with open(sidecar, "r") as f:
+                cached = json.load(f)
+            if cached.get("source") == source_key:
+                cache = cached
+        except (OSError, ValueError):
+            pass
+
+    if entry_key in cache["entries"]:
+        return cache["entries"][entry_key]
+
+    stats = compute_field_statistics(ds, stride, variables, percentiles)
+    cache["entries"][entry_key] = stats
+
+    tmp_file = sidecar.with_name(sidecar.name + ".tmp")
+    try:
+        with open(tmp_file, "w") as f:
+            json.dump(cache, f)
+        os.replace(tmp_file, sidecar)
+    except OSError as e:
+        print(f"  • Could not write statistics cache {sidecar}: {e}")
+
+    return stats
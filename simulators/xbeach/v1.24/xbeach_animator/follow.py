@@ -0,0 +1,144 @@
+import os
+import pathlib
+import time
+from data_processing import get_wave_heights, open_netcdf_file
+from video_encoding import EncoderSettings, concat_movies
+from visualization import (_render_frames, _report_timings,
+                           export_vtk_sequence, prepare_scene)
+
+
+def _ready_steps(ds, size_stable: bool) -> int:
+    """
+    Number of leading output steps that are safe to read. While the file
+    still grows, the last step may be half-written, so it is held back
+    until a later step appears or the file stops changing.
+    """
+    num_steps = ds.sizes["globaltime"]
+    return num_steps if size_stable else max(num_steps - 1, 0)
+
+
+def follow_netcdf(nc_file: str,
+                  animate: bool = True,
+                  export_vtk: bool = False,
+                  out_file: str = "wave.mp4",
+                  vtk_dir: str = "VTK",
+                  angle: tuple[float, float] = (30, -135),
+                  fps: int = 10,
+                  stride: int = 1,
+                  target_vertical_fraction: float = 0.2,
+                  encoder: EncoderSettings = EncoderSettings(),
+                  file_format: str = "vtk",
+                  compression: str = "zlib",
+                  writer_threads: int = 2,
+                  queue_depth: int = 8,
+                  poll_seconds: float = 30.0,
+                  idle_timeout: float = 600.0) -> None:
+    """
+    Follow an XBeach NetCDF file while the run is still writing it, and
+    render or export each newly appended output step once.
+
+    Every `poll_seconds` the file is reopened lazily and only the steps
+    added since the last poll are processed:
+
+    * the animation gets one more segment in `<out_file stem>.segments/`,
+      and `out_file` is re-joined from all segments without re-encoding,
+      so it always holds everything seen so far;
+    * the VTK series gets the new `wave_XXXX` files and an updated `.pvd`
+      (the "xdmf" format is not supported here).
+
+    The scene (point clouds, exaggeration and colour mapping) is prepared
+    once from the first output step, so all segments look alike and polls
+    never rescan the whole run. Following stops once the file has not
+    grown for `idle_timeout` seconds, or on Ctrl-C.
+    """
+    # The simulation holds the file open for writing; HDF5 file locks would
+    # make either side fail to open it.
+    os.environ.setdefault("HDF5_USE_FILE_LOCKING", "FALSE")
+
+    out_path = pathlib.Path(out_file)
+    segments_dir = out_path.with_name(out_path.stem + ".segments")
+    segment_files = []
+    scene = None
+    done = 0
+    last_size = None
+    last_growth = time.monotonic()
+
+    print(f"  • Following {nc_file} (every {poll_seconds:g} s, stopping "
+          f"after {idle_timeout:g} s without new output; Ctrl-C to stop)")
+    try:
+        while True:
+            size = os.path.getsize(nc_file)
+            size_stable = size == last_size
+            if not size_stable:
+                last_growth = time.monotonic()
+            last_size = size
+
+            try:
+                ds = open_netcdf_file(nc_file, streaming=True)
+            except ValueError as e:
+                # The writer may hold the file in an inconsistent state.
+                print(f"  • Could not read {nc_file} yet: {e}")
+                ds = None
+
+            if ds is not None:
+                with ds:
+                    ready = _ready_steps(ds, size_stable)
+                    if ready > done:
+                        ds = ds.isel(globaltime=slice(0, ready))
+                        if scene is None:
+                            scene = prepare_scene(
+                                ds.isel(globaltime=slice(0, 1)),
+                                stride,
+                                target_vertical_fraction=(
+                                    target_vertical_fraction),
+                                use_cache=False)
+                        sim = {
+                            **scene[0],
+                            "H": get_wave_heights(ds, stride),
+                            "times": ds["globaltime"].values,
+                        }
+                        print(f"▶ Steps {done}–{ready - 1} "
+                              f"(t = {sim['times'][-1]:.1f} s)")
+
+                        if animate:
+                            segments_dir.mkdir(parents=True, exist_ok=True)
+                            segment = str(
+                                segments_dir /
+                                f"segment_{len(segment_files):04d}"
+                                f"{out_path.suffix}")
+                            # Frame 0 is the initial scene, frame k step k-1.
+                            timings = _render_frames(
+                                ds,
+                                segment,
+                                angle,
+                                fps,
+                                True,
+                                0 if done == 0 else done + 1,
+                                ready + 1,
+                                encoder=encoder,
+                                scene=(sim, scene[1]))
+                            segment_files.append(segment)
+                            concat_movies(segment_files, out_file)
+                            _report_timings([timings])
+                            print(f"  • Updated animation {out_file} "
+                                  f"({len(segment_files)} segments)")
+
+                        if export_vtk:
+                            export_vtk_sequence(ds,
+                                                vtk_dir=vtk_dir,
+                                                file_format=file_format,
+                                                compression=compression,
+                                                writer_threads=writer_threads,
+                                                queue_depth=queue_depth,
+                                                first_step=done,
+                                                scene=(sim, scene[1]))
+                        done = ready
+
+            if (size_stable and time.monotonic() - last_growth >= idle_timeout
+                    and ds is not None and ready == done):
+                print(f"  • No new output for {idle_timeout:g} s; "
+                      f"stopping after {done} steps.")
+                return
+            time.sleep(poll_seconds)
+    except KeyboardInterrupt:
+        print(f"  • Stopped following after {done} steps.")
@@ -0,0 +1,464 @@
+import hashlib
+import io
+import json
+import os
+import pathlib
+import struct
+import threading
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable, NamedTuple
+
+DOWNLOAD_KINDS = ("inputs", "outputs")
+INDEX_FILE = ".download_index.json"
+PART_SUFFIX = ".part"
+CHUNK_SIZE = 8 * 1024 * 1024
+# First bytes of NetCDF-4 files; classic and 64-bit offset ones start "CDF".
+HDF5_SIGNATURE = b"\x89HDF"
+
+
+class RemoteFile(NamedTuple):
+    path: str  # POSIX path relative to <results_dir>/<kind>/
+    size: int
+    # What the storage knows about the content, to tell changed files apart
+    # from unchanged ones of the same size: the CRC-32 of zip members, the
+    # mtime of local files.
+    crc32: int | None = None
+    mtime_ns: int | None = None
+
+
+class _ByteRange(io.RawIOBase):
+    """
+    Read-only, seekable window `[start, start + size)` of a binary file,
+    e.g. an uncompressed zip member inside a remote archive. Every read
+    seeks the underlying file, so random access only transfers the bytes
+    that are read.
+    """
+
+    def __init__(self, fileobj: BinaryIO, start: int, size: int):
+        super().__init__()
+        self.fileobj = fileobj
+        self.start = start
+        self.size = size
+        self.pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.pos, io.SEEK_END: self.size}[whence]
+        self.pos = max(base + offset, 0)
+        return self.pos
+
+    def readinto(self, buffer) -> int:
+        n = min(len(buffer), self.size - self.pos)
+        if n <= 0:
+            return 0
+        self.fileobj.seek(self.start + self.pos)
+        data = self.fileobj.read(n)
+        buffer[:len(data)] = data
+        self.pos += len(data)
+        return len(data)
+
+    def close(self) -> None:
+        if not self.closed:
+            self.fileobj.close()
+        super().close()
+
+
+class LocalTaskStorage:
+    """
+    Stand-in for remote task storage backed by a local directory laid out
+    like a downloaded task: `<root>/<task_id>/{inputs,outputs}/...`.
+
+    Handy to exercise downloads against a shared or mounted drive, and to
+    test partial re-fetches without network access.
+    """
+
+    def __init__(self, root: str | pathlib.Path, task_id: str):
+        self.task_dir = pathlib.Path(root) / task_id
+        if not self.task_dir.is_dir():
+            raise FileNotFoundError(
+                f"No task directory {self.task_dir} in local task storage")
+
+    def list_files(self, kind: str) -> list[RemoteFile]:
+        kind_dir = self.task_dir / kind
+        if not kind_dir.is_dir():
+            return []
+        files = []
+        for path in sorted(kind_dir.rglob("*")):
+            if path.is_file():
+                st = path.stat()
+                files.append(RemoteFile(path.relative_to(kind_dir).as_posix(),
+                                        st.st_size,
+                                        mtime_ns=st.st_mtime_ns))
+        return files
+
+    def open(self, kind: str, path: str) -> BinaryIO:
+        return open(self.task_dir / kind / path, "rb")
+
+
+class InductivaTaskStorage:
+    """
+    Files of an Inductiva task, read member by member from its input and
+    output ZIP archives over HTTP range requests, so single files can be
+    fetched (and resumed) without downloading whole archives.
+
+    Members stored without compression are read as a byte range of the
+    archive, so seeking (resuming a download, or the random access of
+    `subset_remote_netcdf`) only transfers the bytes that are read.
+    Compressed members can only be decompressed from their start: every
+    backward seek, and every resume, reads the member again from its
+    beginning.
+    """
+    # Prefix of the files inside each archive; inputs keep their `sim_dir/`
+    # folder so `merge_simulation_dirs` finds `inputs/<sim_subdir>/`.
+    ARCHIVE_PREFIXES = {"inputs": "", "outputs": "artifacts/"}
+
+    def __init__(self, task):
+        self.task = task
+        self.task.get_info()
+        self._members = {}
+        self._members_lock = threading.Lock()
+
+    def _open_archive(self, kind: str) -> BinaryIO:
+        import fsspec
+
+        if kind == "inputs":
+            url = self.task.get_input_url()
+        else:
+            url = self.task.get_output_url()
+        if not url:
+            raise RuntimeError(f"No download URL for the {kind} of task "
+                               f"{self.task.id}")
+        return fsspec.filesystem("http").open(url, "rb")
+
+    def _zip_members(self, kind: str) -> dict[str, zipfile.ZipInfo]:
+        """Entries of the archive's central directory, by path in `kind`."""
+        with self._members_lock:
+            if kind not in self._members:
+                prefix = self.ARCHIVE_PREFIXES[kind]
+                with self._open_archive(kind) as remote_file:
+                    infos = zipfile.ZipFile(remote_file).infolist()
+                self._members[kind] = {
+                    info.filename.removeprefix(prefix): info
+                    for info in infos
+                    if info.filename.startswith(prefix) and not info.is_dir()
+                    and info.filename != prefix
+                }
+            return self._members[kind]
+
+    def list_files(self, kind: str) -> list[RemoteFile]:
+        return [
+            RemoteFile(path, info.file_size, crc32=info.CRC)
+            for path, info in sorted(self._zip_members(kind).items())
+        ]
+
+    def open(self, kind: str, path: str) -> BinaryIO:
+        info = self._zip_members(kind)[path]
+        remote_file = self._open_archive(kind)
+        if info.compress_type != zipfile.ZIP_STORED:
+            return zipfile.ZipFile(remote_file).open(info)
+        # The data follows the member's local header, whose name and extra
+        # field lengths may differ from the central directory's.
+        remote_file.seek(info.header_offset)
+        header = remote_file.read(zipfile.sizeFileHeader)
+        name_length, extra_length = struct.unpack("<2H", header[26:30])
+        return _ByteRange(remote_file,
+                          info.header_offset + zipfile.sizeFileHeader +
+                          name_length + extra_length,
+                          info.file_size)
+
+
+def _load_index(results_dir: pathlib.Path) -> dict:
+    try:
+        with open(results_dir / INDEX_FILE, "r") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {"complete": False, "files": {}}
+    index.setdefault("files", {})
+    return index
+
+
+def _save_index(results_dir: pathlib.Path, index: dict) -> None:
+    index_file = results_dir / INDEX_FILE
+    tmp_file = index_file.with_name(f"{index_file.name}.{os.getpid()}.tmp")
+    with open(tmp_file, "w") as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_file, index_file)
+
+
+def is_download_complete(results_dir: pathlib.Path) -> bool:
+    """Whether a previous `sync_task_files` into `results_dir` finished."""
+    return _load_index(pathlib.Path(results_dir)).get("complete", False)
+
+
+def _sha256_file(path: pathlib.Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _crc32_file(path: pathlib.Path) -> int:
+    crc = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def _remote_stamp(remote: RemoteFile) -> list:
+    """What identifies the remote content, as stored in the index."""
+    return [remote.size, remote.crc32, remote.mtime_ns]
+
+
+def _is_up_to_date(local: pathlib.Path, remote: RemoteFile,
+                   entry: dict | None, verify: bool) -> bool:
+    """
+    Whether `local` already holds `remote`. Files recorded in the index
+    are trusted while their size and mtime match the entry. Files not in
+    the index (e.g. downloaded by hand) are accepted when their size
+    matches.
+
+    With `verify`, the file is checked against the remote side instead:
+    its CRC-32 against the one of the zip member, or, for storages without
+    checksums, the remote mtime against the one recorded when it was
+    downloaded (plus the recorded SHA-256 against the local content).
+    """
+    if not local.is_file():
+        return False
+    st = local.stat()
+    if st.st_size != remote.size:
+        return False
+    if verify and remote.crc32 is not None:
+        return _crc32_file(local) == remote.crc32
+    if entry is None:
+        return not verify or remote.mtime_ns is None
+    if entry.get("size") != remote.size:
+        return False
+    if verify:
+        if entry.get("remote") != _remote_stamp(remote):
+            return False
+        if entry.get("sha256"):
+            return _sha256_file(local) == entry["sha256"]
+    return entry.get("mtime_ns") == st.st_mtime_ns
+
+
+def _download_file(storage, kind: str, remote: RemoteFile,
+                   local: pathlib.Path, resume: bool) -> dict:
+    """
+    Download `remote` into `local` through a `.part` file. With `resume`, a
+    `.part` left behind by an interrupted transfer of the same remote file
+    is continued from its current size (see `InductivaTaskStorage` for
+    which members that saves transfer for). Returns the index entry of the
+    finished file.
+    """
+    local.parent.mkdir(parents=True, exist_ok=True)
+    part = local.with_name(local.name + PART_SUFFIX)
+    offset = part.stat().st_size if resume and part.exists() else 0
+    if offset > remote.size:
+        offset = 0
+
+    digest = hashlib.sha256()
+    if offset:
+        with open(part, "rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                digest.update(chunk)
+
+    with storage.open(kind, remote.path) as src, \
+            open(part, "ab" if offset else "wb") as dst:
+        if offset:
+            src.seek(offset)
+        while chunk := src.read(CHUNK_SIZE):
+            dst.write(chunk)
+            digest.update(chunk)
+
+    size = part.stat().st_size
+    if size != remote.size:
+        raise OSError(f"Incomplete download of {kind}/{remote.path}: got "
+                      f"{size} of {remote.size} bytes")
+    os.replace(part, local)
+    return {
+        "size": size,
+        "sha256": digest.hexdigest(),
+        "mtime_ns": local.stat().st_mtime_ns,
+        "remote": _remote_stamp(remote),
+    }
+
+
+def sync_task_files(storage,
+                    results_dir: str | pathlib.Path,
+                    max_workers: int = 4,
+                    verify: bool = False,
+                    only: Callable[[str], bool] | None = None) -> pathlib.Path:
+    """
+    Mirror the inputs and outputs of a task from `storage` into
+    `<results_dir>/{inputs,outputs}/`.
+
+    Files of both kinds are downloaded concurrently by `max_workers`
+    threads. A `.download_index.json` in `results_dir` records the size,
+    SHA-256 and mtime of every finished file: files that are already
+    complete are skipped, and interrupted transfers resume from their
+    `.part` file. With `verify`, local files are checked against the
+    remote CRC-32 (or remote mtime) instead of being trusted by size and
+    mtime, so only files that changed on either side are fetched again.
+
+    `only` restricts the sync to the files whose "<kind>/<path>" key it
+    accepts; such partial syncs do not mark the download as complete.
+    """
+    results_dir = pathlib.Path(results_dir)
+    results_dir.mkdir(parents=True, exist_ok=True)
+    index = _load_index(results_dir)
+    if only is None:
+        index["complete"] = False
+    # Remote stamps of transfers in progress, so a `.part` is only resumed
+    # if the remote file has not changed since it was started.
+    in_progress = index.setdefault("partial", {})
+    index_lock = threading.Lock()
+
+    pending = []
+    listed = 0
+    for kind in DOWNLOAD_KINDS:
+        for remote in storage.list_files(kind):
+            key = f"{kind}/{remote.path}"
+            if only is not None and not only(key):
+                continue
+            listed += 1
+            local = results_dir / kind / remote.path
+            if _is_up_to_date(local, remote, index["files"].get(key), verify):
+                continue
+            pending.append((kind, remote, local, key))
+
+    total_bytes = sum(remote.size for _, remote, _, _ in pending)
+    print(f"  • {listed - len(pending)} of {listed} files already complete "
+          f"in {results_dir}, downloading {len(pending)} "
+          f"({total_bytes / 1e6:.1f} MB)")
+
+    def fetch(kind: str, remote: RemoteFile, local: pathlib.Path,
+              key: str) -> None:
+        with index_lock:
+            resume = in_progress.get(key) == _remote_stamp(remote)
+            in_progress[key] = _remote_stamp(remote)
+            _save_index(results_dir, index)
+        entry = _download_file(storage, kind, remote, local, resume)
+        with index_lock:
+            del in_progress[key]
+            index["files"][key] = entry
+            _save_index(results_dir, index)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+        futures = [executor.submit(fetch, *job) for job in pending]
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - start
+
+    if only is None:
+        index["complete"] = True
+    _save_index(results_dir, index)
+    if pending:
+        print(f"  • Downloaded {total_bytes / 1e6:.1f} MB in {elapsed:.1f} s "
+              f"({total_bytes / 1e6 / max(elapsed, 1e-9):.1f} MB/s)")
+    return results_dir
+
+
+def subset_remote_netcdf(storage,
+                         kind: str,
+                         path: str,
+                         local: str | pathlib.Path,
+                         variables: tuple[str, ...],
+                         t_start: float | None = None,
+                         t_end: float | None = None) -> pathlib.Path:
+    """
+    Write only `variables` (plus their coordinates) of the remote NetCDF
+    file, restricted to `t_start <= globaltime <= t_end`, to `local`.
+
+    NetCDF-4 (HDF5) files are opened in place through `storage.open` with
+    the `h5netcdf` engine, as netCDF4 cannot read file objects, and copied
+    one output step at a time, so only the parts of the file those steps
+    touch are read. For archive members stored without compression that
+    is all that is transferred; a compressed member is decompressed again
+    from its start on every backward seek (see `InductivaTaskStorage`), so
+    it may be streamed several times.
+
+    Classic and 64-bit offset NetCDF files cannot be read lazily from a
+    file object; they are downloaded in full next to `local` (where a full
+    `--selective-fetch` would put them) and subset from there.
+
+    A `<local>.json` sidecar records the selection and the remote size, so
+    an unchanged subset is reused.
+    """
+    import xarray as xr
+
+    local = pathlib.Path(local)
+    remotes = {f.path: f for f in storage.list_files(kind)}
+    if path not in remotes:
+        raise FileNotFoundError(f"{kind}/{path} not found in task storage")
+    remote = remotes[path]
+    selection = {
+        "source": f"{kind}/{path}",
+        "size": remote.size,
+        "variables": sorted(variables),
+        "t_start": t_start,
+        "t_end": t_end,
+    }
+    sidecar = local.with_name(local.name + ".json")
+    if local.exists() and sidecar.exists():
+        try:
+            with open(sidecar, "r") as f:
+                if json.load(f) == selection:
+                    return local
+        except (OSError, ValueError):
+            pass
+
+    local.parent.mkdir(parents=True, exist_ok=True)
+    part = local.with_name(local.name + PART_SUFFIX)
+    start = time.perf_counter()
+    with storage.open(kind, path) as src:
+        signature = src.read(len(HDF5_SIGNATURE))
+        if signature == HDF5_SIGNATURE:
+            try:
+                import h5netcdf  # noqa: F401
+            except ImportError as e:
+                raise RuntimeError("Streaming a subset of a remote NetCDF-4 "
+                                   "file needs the h5netcdf package "
+                                   "(pip install h5netcdf)") from e
+            src.seek(0)
+            with xr.open_dataset(src, engine="h5netcdf",
+                                 chunks={"globaltime": 1}) as ds:
+                _write_subset(ds, part, variables, t_start, t_end)
+            how = "Streamed"
+        elif signature[:3] != b"CDF":
+            raise ValueError(f"{kind}/{path} is not a NetCDF file")
+
+    if signature != HDF5_SIGNATURE:
+        full = local.with_name(pathlib.PurePosixPath(path).name)
+        if not _is_up_to_date(full, remote, None, verify=False):
+            _download_file(storage, kind, remote, full, resume=False)
+        with xr.open_dataset(full, chunks={"globaltime": 1}) as ds:
+            _write_subset(ds, part, variables, t_start, t_end)
+        how = "Downloaded (classic NetCDF) and subset"
+
+    os.replace(part, local)
+    with open(sidecar, "w") as f:
+        json.dump(selection, f)
+    print(f"  • {how} {', '.join(variables)} of {kind}/{path} → {local} "
+          f"({local.stat().st_size / 1e6:.1f} of {remote.size / 1e6:.1f} MB "
+          f"in {time.perf_counter() - start:.1f} s)")
+    return local
+
+
+def _write_subset(ds, part: pathlib.Path, variables: tuple[str, ...],
+                  t_start: float | None, t_end: float | None) -> None:
+    subset = ds[list(variables)].sel(globaltime=slice(t_start, t_end))
+    subset.to_netcdf(part)
@@ -0,0 +1,98 @@
+import os
+import pathlib
+import subprocess
+import tempfile
+import time
+from typing import NamedTuple
+import imageio_ffmpeg
+import numpy as np
+
+
+class EncoderSettings(NamedTuple):
+    """x264 settings for `FFmpegPipeWriter` (see `ffmpeg -h encoder=libx264`).
+
+    threads=0 lets x264 pick a thread count from the available cores.
+    """
+    preset: str = "medium"
+    crf: int = 18
+    threads: int = 0
+    pix_fmt: str = "yuv420p"
+
+
+class FFmpegPipeWriter:
+    """
+    Stream raw RGB frames straight into an `ffmpeg` subprocess encoding to
+    H.264, so encoding runs in its own process alongside rendering and
+    frames are not copied through an intermediate writer.
+
+    `encode_seconds` accumulates the time spent blocked on the encoder,
+    i.e. writing to its pipe and waiting for it to finish on close.
+    """
+
+    def __init__(self,
+                 out_file: str,
+                 size: tuple[int, int],
+                 fps: int,
+                 settings: EncoderSettings = EncoderSettings()):
+        width, height = size
+        self.out_file = out_file
+        self.encode_seconds = 0.0
+        self.frames = 0
+        self._proc = subprocess.Popen(
+            [
+                imageio_ffmpeg.get_ffmpeg_exe(), "-y", "-loglevel", "error",
+                "-f", "rawvideo", "-pix_fmt", "rgb24", "-s",
+                f"{width}x{height}", "-framerate",
+                str(fps), "-i", "-", "-an", "-c:v", "libx264", "-preset",
+                settings.preset, "-crf",
+                str(settings.crf), "-threads",
+                str(settings.threads), "-pix_fmt", settings.pix_fmt, out_file
+            ],
+            stdin=subprocess.PIPE,
+        )
+
+    def write(self, frame: np.ndarray) -> None:
+        """Write one (height, width, 3) uint8 RGB frame."""
+        start = time.perf_counter()
+        self._proc.stdin.write(memoryview(np.ascontiguousarray(frame)))
+        self.encode_seconds += time.perf_counter() - start
+        self.frames += 1
+
+    def close(self) -> None:
+        start = time.perf_counter()
+        self._proc.stdin.close()
+        return_code = self._proc.wait()
+        self.encode_seconds += time.perf_counter() - start
+        if return_code != 0:
+            raise RuntimeError(f"ffmpeg exited with code {return_code} while "
+                               f"encoding {self.out_file}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._proc.kill()
+            self._proc.wait()
+
+
+def concat_movies(segment_files: list[str], out_file: str) -> None:
+    """
+    Concatenate movie segments encoded with identical settings into
+    `out_file` with ffmpeg's concat demuxer, without re-encoding.
+    """
+    with tempfile.NamedTemporaryFile("w", suffix=".txt",
+                                     delete=False) as list_file:
+        for segment in segment_files:
+            list_file.write(f"file '{pathlib.Path(segment).resolve()}'\n")
+    try:
+        subprocess.run([
+            imageio_ffmpeg.get_ffmpeg_exe(), "-y", "-loglevel", "error",
+            "-f", "concat", "-safe", "0", "-i", list_file.name, "-c", "copy",
+            out_file
+        ],
+                       check=True)
+    finally:
+        os.remove(list_file.name)
@@ -1,9 +1,49 @@
+import hashlib
+import json
 import math
+import multiprocessing
+import os
 import pathlib
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from typing import Iterator, NamedTuple
 import numpy as np
 import pyvista as pv
-from data_processing import get_simulation_variables
+from vtkmodules.vtkIOXML import vtkXMLStructuredGridWriter
+from data_processing import (_get_terrain_and_ocean_colormaps,
+                             get_simulation_variables, get_wave_heights,
+                             open_netcdf_file, select_time_window)
+from derived_cache import load_derived_products, save_derived_products
+from video_encoding import EncoderSettings, FFmpegPipeWriter, concat_movies
+
+VTK_FILE_FORMATS = ("vtk", "vts", "xdmf")
+VTS_COMPRESSORS = {
+    "none": "SetCompressorTypeToNone",
+    "zlib": "SetCompressorTypeToZLib",
+    "lz4": "SetCompressorTypeToLZ4",
+    "lzma": "SetCompressorTypeToLZMA",
+}
+# Off-screen movie resolution and camera zoom used by animate_wave.
+WINDOW_SIZE = (1200, 800)
+CAMERA_ZOOM = 1.2
+# h5py filters used for the "xdmf" format; LZ4 needs an HDF5 plugin, so the
+# built-in LZF filter stands in as the fast option.
+HDF5_COMPRESSORS = {"none": None, "zlib": "gzip", "lz4": "lzf"}
+# Per-frame record of exported VTK files, `<vtk_dir>/<prefix>.manifest.json`.
+VTK_MANIFEST_SUFFIX = ".manifest.json"
+
+# Off-screen plotter kept alive between animations of one process when
+# render-context reuse is requested (see `_get_plotter`).
+_shared_plotter = None
+_shared_view_angle = None
+
+
+class RenderTimings(NamedTuple):
+    frames: int
+    render_seconds: float
+    encode_seconds: float
 
 
 class PointCloudData(NamedTuple):
@@ -93,6 +133,82 @@ def prepare_point_clouds(
                           center_y=center_y)
 
 
+def _scene_cache_params(ds, stride: int, coarsen: int,
+                        target_vertical_fraction: float) -> dict:
+    times_digest = hashlib.sha1(
+        np.ascontiguousarray(ds["globaltime"].values).tobytes()).hexdigest()
+    return {
+        "kind": "scene",
+        "stride": stride,
+        "coarsen": coarsen,
+        "vertical_fraction": float(target_vertical_fraction),
+        "times": times_digest,
+    }
+
+
+def prepare_scene(ds,
+                  stride: int = 1,
+                  coarsen: int = 1,
+                  target_vertical_fraction: float = 0.2,
+                  use_cache: bool = True) -> tuple[dict, PointCloudData]:
+    """
+    Return the simulation variables and the prepared point clouds of `ds`.
+
+    The point clouds, exaggeration factors and colormap bounds are cached
+    on disk (see `derived_cache`), keyed by the netcdf content, the time
+    selection, `stride`, `coarsen` and `target_vertical_fraction`. On a hit
+    the grid, the seabed and the statistics pass are not read at all; only
+    the wave heights are opened, and read lazily as usual.
+
+    The returned dict holds "Zs", "H", "times", "Zmin", "Zmax" and the
+    colormaps, like `get_simulation_variables`.
+    """
+    source = ds.encoding.get("source")
+    nc_file = str(pathlib.Path(source).resolve()) if source else None
+    params = _scene_cache_params(ds, stride, coarsen, target_vertical_fraction)
+
+    cached = load_derived_products(nc_file, params) if use_cache else None
+    if cached is not None:
+        pc = PointCloudData(
+            bed_points=cached["bed_points"],
+            wave_points=cached["wave_points"],
+            grid_dimensions=tuple(int(d) for d in cached["grid_dimensions"]),
+            min_z=float(cached["min_z"]),
+            vertical_exaggeration=float(cached["vertical_exaggeration"]),
+            center_x=float(cached["center_x"]),
+            center_y=float(cached["center_y"]))
+        Zmin, Zmax = float(cached["Zmin"]), float(cached["Zmax"])
+        sim = {
+            "Zs": cached["Zs"],
+            "H": get_wave_heights(ds, stride, coarsen),
+            "times": ds["globaltime"].values,
+            "Zmin": Zmin,
+            "Zmax": Zmax,
+            **_get_terrain_and_ocean_colormaps(Zmin, Zmax)
+        }
+        return sim, pc
+
+    sim = get_simulation_variables(ds, stride, coarsen)
+    pc = prepare_point_clouds(sim["X"], sim["Y"], sim["Zb"], sim["Zs"],
+                              np.asarray(sim["H"][0]),
+                              target_vertical_fraction)
+    if use_cache:
+        save_derived_products(
+            nc_file, params, {
+                "bed_points": pc.bed_points,
+                "wave_points": pc.wave_points,
+                "grid_dimensions": np.asarray(pc.grid_dimensions),
+                "min_z": pc.min_z,
+                "vertical_exaggeration": pc.vertical_exaggeration,
+                "center_x": pc.center_x,
+                "center_y": pc.center_y,
+                "Zs": sim["Zs"],
+                "Zmin": sim["Zmin"],
+                "Zmax": sim["Zmax"],
+            })
+    return sim, pc
+
+
 def update_wave_points(base_xy: np.ndarray, Zs: np.ndarray, H_t: np.ndarray,
                        min_z: float, exag: float) -> np.ndarray:
     """
@@ -106,84 +222,619 @@ def update_wave_points(base_xy: np.ndarray, Zs: np.ndarray, H_t: np.ndarray,
 
 
 def iterate_time_steps(pc: PointCloudData, Zs: np.ndarray,
-                       H: np.ndarray) -> Iterator[np.ndarray]:
+                       H) -> Iterator[np.ndarray]:
     """
     Yields one wave‐point‐cloud per time step.
+
+    H may be a numpy array or a lazy (dask-backed) DataArray, in which case
+    each time slice is only read from disk when its frame is produced.
     """
     # pre‐flattened XY
     base_xy = pc.wave_points[:, :2]
     for t in range(H.shape[0]):
-        yield update_wave_points(base_xy, Zs, H[t], pc.min_z,
+        yield update_wave_points(base_xy, Zs, np.asarray(H[t]), pc.min_z,
                                  pc.vertical_exaggeration)
 
 
-def animate_wave(ds, out_file="wave.mp4", angle=(30, -135), fps=10):
-    sim = get_simulation_variables(ds)
+def update_wave_points_into(out: np.ndarray, Zs: np.ndarray, H_t: np.ndarray,
+                            min_z: float, exag: float) -> np.ndarray:
+    """
+    In-place counterpart of `update_wave_points`: writes the exaggerated
+    wave elevation of slice H_t into the z column of `out` (shape=(N,3))
+    with in-place ufuncs, leaving its X/Y columns untouched.
+    """
+    z_vals = out[:, 2].reshape(Zs.shape, copy=False)
+    np.add(Zs, H_t, out=z_vals)
+    np.subtract(z_vals, min_z, out=z_vals)
+    np.multiply(z_vals, exag, out=z_vals)
+    np.add(z_vals, min_z, out=z_vals)
+    return out
+
+
+def iterate_time_steps_into(pc: PointCloudData,
+                            Zs: np.ndarray,
+                            H,
+                            out: np.ndarray | None = None,
+                            dtype=np.float64) -> Iterator[np.ndarray]:
+    """
+    Like `iterate_time_steps`, but every time step is written into the same
+    (N,3) buffer, so no full-grid arrays are allocated per frame. The yielded
+    buffer is overwritten by the next step; copy it if it must be kept.
+
+    `out` may be any writable (N,3) float array (e.g. the points of a VTK
+    grid); if omitted, one is allocated with the given dtype. Its X/Y
+    columns are filled once from `pc`.
+    """
+    if out is None:
+        out = np.empty(pc.wave_points.shape, dtype=dtype)
+    out[:, :2] = pc.wave_points[:, :2]
+    for t in range(H.shape[0]):
+        yield update_wave_points_into(out, Zs, np.asarray(H[t]), pc.min_z,
+                                      pc.vertical_exaggeration)
+
+
+def _add_wave_mesh(plotter: pv.Plotter, wave: pv.StructuredGrid, cmap):
+    return plotter.add_mesh(wave,
+                            scalars="wave",
+                            cmap=cmap,
+                            opacity=0.7,
+                            show_scalar_bar=False)
+
+
+def _set_camera(plotter: pv.Plotter, angle: tuple[float, float]) -> None:
+    elev, azim = angle
+    cam_vec = (
+        math.cos(math.radians(azim)) * math.cos(math.radians(elev)),
+        math.sin(math.radians(azim)) * math.cos(math.radians(elev)),
+        math.sin(math.radians(elev)),
+    )
+    plotter.view_vector(cam_vec)
+    plotter.camera.zoom(CAMERA_ZOOM)
+
+
+def update_wave_mesh(wave: pv.StructuredGrid, pts: np.ndarray) -> None:
+    """
+    Overwrite the points and "wave" scalars of `wave` in place and mark the
+    underlying VTK arrays as modified, so the existing actor, mapper and
+    lookup table are reused for the next render. `pts` may already be the
+    grid's own point buffer (see `iterate_time_steps_into`).
+    """
+    if not np.may_share_memory(wave.points, pts):
+        wave.points[:] = pts
+    wave["wave"][:] = pts[:, 2]
+    wave.GetPoints().Modified()
+    wave.GetPointData().GetArray("wave").Modified()
+
+
+def _get_plotter(reuse: bool) -> pv.Plotter:
+    """
+    Return an off-screen plotter. With `reuse`, one plotter (and so one
+    render window and OpenGL context) is created per process and handed out
+    again on every later call, with its actors removed and its camera zoom
+    undone; it must then not be closed by the caller.
+    """
+    global _shared_plotter, _shared_view_angle
+    if not reuse:
+        return pv.Plotter(off_screen=True, window_size=WINDOW_SIZE)
+    if _shared_plotter is None:
+        _shared_plotter = pv.Plotter(off_screen=True, window_size=WINDOW_SIZE)
+        _shared_view_angle = _shared_plotter.camera.view_angle
+    else:
+        # Keep the lights: clear() would also remove the default light kit.
+        _shared_plotter.clear_actors()
+        # Zooming narrows the view angle, so undo the previous zoom.
+        _shared_plotter.camera.view_angle = _shared_view_angle
+    return _shared_plotter
+
+
+def choose_lod_factor(grid_shape: tuple[int, int],
+                      window_size: tuple[int, int] = WINDOW_SIZE,
+                      zoom: float = CAMERA_ZOOM,
+                      points_per_pixel: float = 1.0) -> int:
+    """
+    Pick the block-averaging factor at which the grid still has about
+    `points_per_pixel` points per screen pixel along its longest side.
+
+    The camera frames the whole domain, so its longest side spans at most
+    the longest window side, magnified by the camera zoom; finer grids
+    only add points that fall on the same pixels.
+    """
+    visible_pixels = max(window_size) * zoom * points_per_pixel
+    return max(1, int(max(grid_shape) // visible_pixels))
+
+
+def _render_frames(ds,
+                   out_file: str,
+                   angle: tuple[float, float],
+                   fps: int,
+                   in_place: bool,
+                   start: int,
+                   stop: int,
+                   stride: int = 1,
+                   coarsen: int = 1,
+                   encoder: EncoderSettings = EncoderSettings(),
+                   target_vertical_fraction: float = 0.2,
+                   use_cache: bool = True,
+                   reuse_plotter: bool = False,
+                   scene: tuple[dict, PointCloudData] | None = None
+                  ) -> RenderTimings:
+    """
+    Render frames [start, stop) of the animation into `out_file`. Frame 0
+    is the initial scene and frame k > 0 shows time step k - 1, so any
+    contiguous range renders exactly what the serial loop would.
 
-    X, Y, Zb, Zs, H = sim["X"], sim["Y"], sim["Zb"], sim["Zs"], sim["H"]
+    Frames are grabbed from the render window and piped to ffmpeg as raw
+    RGB. Returns the time spent rendering (scene update, render and frame
+    grab) and blocked on the encoder. With `reuse_plotter` the process-wide
+    plotter from `_get_plotter` is used and left open.
 
-    point_cloud_data = prepare_point_clouds(X, Y, Zb, Zs, H[0])
+    `scene` is a prepared `(sim, point_clouds)` pair (see `prepare_scene`)
+    to render instead of preparing one from `ds`.
+    """
+    if scene is None:
+        scene = prepare_scene(ds, stride, coarsen, target_vertical_fraction,
+                              use_cache)
+    sim, point_cloud_data = scene
+    Zs, H = sim["Zs"], sim["H"]
     dims = point_cloud_data.grid_dimensions
-    z_min = point_cloud_data.min_z
-    exag = point_cloud_data.vertical_exaggeration
 
     seabed = _build_structured_grid(point_cloud_data.bed_points, dims,
                                     "elevation")
     wave = _build_structured_grid(point_cloud_data.wave_points, dims, "wave")
 
-    plotter = pv.Plotter(off_screen=True, window_size=(1200, 800))
-    plotter.open_movie(out_file, framerate=fps, codec="libx264", quality=10)
+    plotter = _get_plotter(reuse_plotter)
+    writer = FFmpegPipeWriter(out_file, WINDOW_SIZE, fps, encoder)
     plotter.add_mesh(seabed,
                      scalars="elevation",
                      cmap=sim["seabed_cmap"],
                      show_scalar_bar=False)
-    actor = plotter.add_mesh(wave,
-                             scalars="wave",
-                             cmap=sim["ocean_cmap"],
-                             opacity=0.7,
-                             show_scalar_bar=False)
+    actor = _add_wave_mesh(plotter, wave, sim["ocean_cmap"])
     time_text = plotter.add_text("",
                                  position="upper_left",
                                  font_size=12,
                                  color="black")
 
-    elev, azim = angle
-    cam_vec = (
-        math.cos(math.radians(azim)) * math.cos(math.radians(elev)),
-        math.sin(math.radians(azim)) * math.cos(math.radians(elev)),
-        math.sin(math.radians(elev)),
-    )
-    plotter.view_vector(cam_vec)
-    plotter.camera.zoom(1.2)
-    plotter.render()
-    plotter.write_frame()
-
-    for t, pts in enumerate(iterate_time_steps(point_cloud_data, Zs, H)):
-        wave.points = pts
-
-        plotter.remove_actor(actor)
-        actor = plotter.add_mesh(wave,
-                                 scalars="wave",
-                                 cmap=sim["ocean_cmap"],
-                                 opacity=0.7,
-                                 show_scalar_bar=False)
+    _set_camera(plotter, angle)
+    render_seconds = 0.0
+    if start == 0:
+        render_start = time.perf_counter()
+        plotter.render()
+        frame = plotter.screenshot(return_img=True)
+        render_seconds += time.perf_counter() - render_start
+        writer.write(frame)
+
+    first_step = max(start - 1, 0)
+    steps = H[first_step:stop - 1]
+    if in_place:
+        # Write each step straight into the VTK point buffer of the mesh.
+        frames = iterate_time_steps_into(point_cloud_data, Zs, steps,
+                                         out=wave.points)
+    else:
+        frames = iterate_time_steps(point_cloud_data, Zs, steps)
+
+    render_start = time.perf_counter()
+    for t, pts in enumerate(frames, start=first_step):
+        if in_place:
+            update_wave_mesh(wave, pts)
+        else:
+            wave.points = pts
+            plotter.remove_actor(actor)
+            actor = _add_wave_mesh(plotter, wave, sim["ocean_cmap"])
         time_text.set_text(
             text=f"t = {sim['times'][t]:.1f} s | Step = {t}",
             position="upper_left",
         )
         plotter.render()
-        plotter.write_frame()
+        frame = plotter.screenshot(return_img=True)
+        render_seconds += time.perf_counter() - render_start
+        writer.write(frame)
+        render_start = time.perf_counter()
+
+    if not reuse_plotter:
+        plotter.close()
+    writer.close()
+    return RenderTimings(writer.frames, render_seconds, writer.encode_seconds)
+
+
+def _render_segment(nc_file: str, streaming: bool, window: tuple,
+                    stride: int, coarsen: int, out_file: str,
+                    angle: tuple[float, float], fps: int, in_place: bool,
+                    start: int, stop: int, encoder: EncoderSettings,
+                    target_vertical_fraction: float,
+                    use_cache: bool) -> RenderTimings:
+    """Worker entry point: reopen the dataset and render one segment."""
+    ds = select_time_window(open_netcdf_file(nc_file, streaming=streaming),
+                            *window)
+    return _render_frames(ds, out_file, angle, fps, in_place, start, stop,
+                          stride, coarsen, encoder, target_vertical_fraction,
+                          use_cache)
+
+
+def _split_range(start: int, stop: int,
+                 parts: int) -> list[tuple[int, int]]:
+    """Split [start, stop) into at most `parts` contiguous, even ranges."""
+    bounds = np.linspace(start, stop, min(parts, stop - start) + 1)
+    bounds = bounds.round().astype(int)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _report_timings(timings: list[RenderTimings]) -> None:
+    frames = sum(t.frames for t in timings)
+    render = sum(t.render_seconds for t in timings)
+    encode = sum(t.encode_seconds for t in timings)
+    per_frame = 1000 / max(frames, 1)
+    print(f"  • {frames} frames: render {render:.1f} s "
+          f"({render * per_frame:.1f} ms/frame), waiting on encoder "
+          f"{encode:.1f} s ({encode * per_frame:.1f} ms/frame)")
+
+
+def animate_wave(ds,
+                 out_file="wave.mp4",
+                 angle=(30, -135),
+                 fps=10,
+                 in_place=True,
+                 workers=1,
+                 stride=1,
+                 t_start=None,
+                 t_end=None,
+                 t_stride=1,
+                 lod=False,
+                 encoder=EncoderSettings(),
+                 target_vertical_fraction=0.2,
+                 use_cache=True,
+                 reuse_render_context=False):
+    """
+    Render the wave time-series over the seabed into a movie.
+
+    Only output steps with `t_start <= globaltime <= t_end`, every
+    `t_stride`-th step, and every `stride`-th grid point are read and
+    rendered (see `select_time_window`).
+
+    With `lod`, grids finer than the movie can show are block-averaged by
+    the factor from `choose_lod_factor` before rendering.
+
+    With `in_place` (default) a single wave actor is kept and its points
+    and scalars are updated in place every frame. Otherwise the actor is
+    removed and re-added each frame, which rebuilds the mapper, lookup
+    table and GPU buffers.
+
+    With `workers` > 1 the frames are split into contiguous segments, each
+    rendered by its own process with the same scene setup, and the segments
+    are joined into `out_file` without re-encoding. The dataset must then
+    have been opened from a file, which every worker reopens.
 
-    plotter.close()
-    print(f"Saved animation to {out_file}")
+    Frames are piped to an ffmpeg x264 encoder configured by `encoder`;
+    the time spent rendering and waiting on the encoder is reported.
+
+    The prepared scene is cached on disk unless `use_cache` is False (see
+    `prepare_scene`), so re-rendering the same run with another camera
+    angle, fps or encoder skips the preprocessing.
+
+    With `reuse_render_context`, serial renders share one off-screen render
+    window per process across calls, e.g. when one process animates many
+    runs (see the CLI batch mode).
+    """
+    window = (t_start, t_end, t_stride)
+    ds = select_time_window(ds, *window)
+    num_frames = ds.sizes["globaltime"] + 1
+
+    coarsen = 1
+    if lod:
+        strided_shape = ds["globalx"][::stride, ::stride].shape
+        coarsen = choose_lod_factor(strided_shape)
+        print(f"  • Level of detail: averaging {coarsen}x{coarsen} blocks "
+              f"of the {strided_shape[0]}x{strided_shape[1]} grid")
+
+    if workers <= 1:
+        timings = _render_frames(ds, out_file, angle, fps, in_place, 0,
+                                 num_frames, stride, coarsen, encoder,
+                                 target_vertical_fraction, use_cache,
+                                 reuse_render_context)
+        _report_timings([timings])
+        print(f"Saved animation to {out_file}")
+        return
+
+    nc_file = ds.encoding.get("source")
+    if not nc_file:
+        raise ValueError("Parallel rendering needs a dataset opened from a "
+                         "netcdf file.")
+    streaming = ds["H"].chunks is not None
+
+    # Fill the caches once, instead of racing on them in every worker.
+    # Without the cache the workers cannot reuse it, so skip the pass.
+    if use_cache:
+        prepare_scene(ds, stride, coarsen, target_vertical_fraction)
+
+    segments = _split_range(0, num_frames, workers)
+    out_path = pathlib.Path(out_file)
+    with tempfile.TemporaryDirectory(dir=out_path.parent.resolve(),
+                                     prefix=".segments_") as tmp_dir:
+        segment_files = [
+            str(pathlib.Path(tmp_dir) / f"segment_{i:04d}{out_path.suffix}")
+            for i in range(len(segments))
+        ]
+        # VTK render contexts are not fork-safe, so workers are spawned.
+        with ProcessPoolExecutor(
+                max_workers=len(segments),
+                mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = [
+                executor.submit(_render_segment, nc_file, streaming, window,
+                                stride, coarsen, seg_file, angle, fps,
+                                in_place, start, stop, encoder,
+                                target_vertical_fraction, use_cache)
+                for seg_file, (start, stop) in zip(segment_files, segments)
+            ]
+            timings = [future.result() for future in futures]
+
+        concat_movies(segment_files, out_file)
+        _report_timings(timings)
+
+    print(f"Saved animation to {out_file} ({len(segments)} segments)")
+
+
+def _save_grid(grid: pv.StructuredGrid, filename: pathlib.Path,
+               compression: str) -> None:
+    """
+    Save `grid` to `filename`. Legacy `.vtk` files go through pyvista; XML
+    `.vts` files are written as raw appended binary with the requested
+    compressor ("none", "zlib", "lz4" or "lzma").
+    """
+    if filename.suffix != ".vts":
+        grid.save(str(filename))
+        return
+
+    writer = vtkXMLStructuredGridWriter()
+    writer.SetInputData(grid)
+    writer.SetFileName(str(filename))
+    writer.SetDataModeToAppended()
+    writer.EncodeAppendedDataOff()
+    getattr(writer, VTS_COMPRESSORS[compression])()
+    if not writer.Write():
+        raise OSError(f"Failed to write {filename}")
+
+
+def write_pvd_collection(pvd_file: pathlib.Path, files: list[pathlib.Path],
+                         times) -> None:
+    """
+    Write a ParaView `.pvd` collection indexing `files` by their simulation
+    time, so the whole sequence loads as one time-dependent dataset.
+    """
+    lines = [
+        '<?xml version="1.0"?>',
+        '<VTKFile type="Collection" version="0.1" '
+        'byte_order="LittleEndian">',
+        "  <Collection>",
+    ]
+    for file, time_value in zip(files, times):
+        rel = os.path.relpath(file, pvd_file.parent)
+        lines.append(f'    <DataSet timestep="{float(time_value)!r}" '
+                     f'group="" part="0" file="{rel}"/>')
+    lines += ["  </Collection>", "</VTKFile>", ""]
+    pvd_file.write_text("\n".join(lines))
+
+
+def _xdmf_hdf_item(h5_name: str, path: str, dims: str) -> str:
+    return (f'<DataItem Dimensions="{dims}" NumberType="Float" '
+            f'Precision="8" Format="HDF">{h5_name}:{path}</DataItem>')
+
+
+def _xdmf_time_slice_item(h5_name: str, t: int, nt: int, ny: int,
+                          nx: int) -> str:
+    return (f'<DataItem ItemType="HyperSlab" Dimensions="{ny} {nx}" '
+            f'Type="HyperSlab">'
+            f'<DataItem Dimensions="3 3" Format="XML">'
+            f'{t} 0 0 1 1 1 1 {ny} {nx}</DataItem>' +
+            _xdmf_hdf_item(h5_name, "/wave/z", f"{nt} {ny} {nx}") +
+            '</DataItem>')
+
+
+def _xdmf_uniform_grid(name: str, topology: str, xy_items: list[str],
+                       z_item: str, scalar_name: str, time_value=None) -> str:
+    time_tag = (f'<Time Value="{float(time_value)!r}"/>'
+                if time_value is not None else "")
+    return (f'<Grid Name="{name}" GridType="Uniform">{time_tag}{topology}'
+            f'<Geometry GeometryType="X_Y_Z">{"".join(xy_items)}{z_item}'
+            f'</Geometry><Attribute Name="{scalar_name}" '
+            f'AttributeType="Scalar" Center="Node">{z_item}</Attribute>'
+            f'</Grid>')
+
+
+def export_xdmf_time_series(ds,
+                            xdmf_file: str = "VTK/wave.xdmf",
+                            target_vertical_fraction: float = 0.2,
+                            compression: str = "zlib",
+                            stride: int = 1,
+                            t_start: float | None = None,
+                            t_end: float | None = None,
+                            t_stride: int = 1,
+                            use_cache: bool = True) -> None:
+    """
+    Export the seabed and the wave time-series to a single HDF5 file plus an
+    XDMF index (readable by ParaView/VisIt) next to it.
+
+    The XY geometry and the seabed are stored once; the wave elevation is a
+    chunked, compressed (time, ny, nx) dataset with one chunk per time step,
+    and every time step of the XDMF collection points at its row. Only one
+    frame is held in memory while writing.
+
+    Parameters:
+        ds (xr.Dataset): your XBeach netcdf dataset.
+        xdmf_file (str): path of the `.xdmf` file; the data goes to the
+        `.h5` file of the same name.
+        target_vertical_fraction (float): same exaggeration fraction
+        used in prepare_point_clouds.
+        compression (str): "none", "zlib" (gzip) or "lz4" (LZF).
+        stride (int): spatial stride applied to the grid.
+        t_start, t_end (float | None): time window in seconds.
+        t_stride (int): keep every `t_stride`-th output step.
+        use_cache (bool): reuse the prepared point clouds cached on disk
+        (see `prepare_scene`).
+    """
+    import h5py
+
+    if compression not in HDF5_COMPRESSORS:
+        raise ValueError(f"Unsupported compression {compression!r} for "
+                         f"xdmf; expected one of {tuple(HDF5_COMPRESSORS)}.")
+
+    ds = select_time_window(ds, t_start, t_end, t_stride)
+    sim, pc = prepare_scene(ds, stride, 1, target_vertical_fraction,
+                            use_cache)
+    Zs, H = sim["Zs"], sim["H"]
+
+    xdmf_path = pathlib.Path(xdmf_file)
+    xdmf_path.parent.mkdir(parents=True, exist_ok=True)
+    h5_path = xdmf_path.with_suffix(".h5")
+
+    nt = H.shape[0]
+    nx, ny, _ = pc.grid_dimensions
+    filter_name = HDF5_COMPRESSORS[compression]
+
+    with h5py.File(h5_path, "w") as h5:
+        h5["time"] = np.asarray(sim["times"], dtype=np.float64)
+        h5["geometry/x"] = pc.bed_points[:, 0].reshape(ny, nx)
+        h5["geometry/y"] = pc.bed_points[:, 1].reshape(ny, nx)
+        h5["seabed/z"] = pc.bed_points[:, 2].reshape(ny, nx)
+        wave_z = h5.create_dataset("wave/z",
+                                   shape=(nt, ny, nx),
+                                   dtype=np.float64,
+                                   chunks=(1, ny, nx),
+                                   compression=filter_name)
+        for t, pts in enumerate(iterate_time_steps_into(pc, Zs, H)):
+            wave_z[t] = pts[:, 2].reshape(ny, nx)
+            if t % 10 == 0 or t == nt - 1:
+                print(f"  • Wrote frame {t+1}/{nt} → {h5_path}")
+
+    h5_name = h5_path.name
+    topology = f'<Topology TopologyType="2DSMesh" Dimensions="{ny} {nx}"/>'
+    dims = f"{ny} {nx}"
+    xy_items = [
+        _xdmf_hdf_item(h5_name, "/geometry/x", dims),
+        _xdmf_hdf_item(h5_name, "/geometry/y", dims),
+    ]
+    seabed = _xdmf_uniform_grid("seabed", topology, xy_items,
+                                _xdmf_hdf_item(h5_name, "/seabed/z", dims),
+                                "elevation")
+    steps = [
+        _xdmf_uniform_grid(f"wave_{t:04d}", topology, xy_items,
+                           _xdmf_time_slice_item(h5_name, t, nt, ny, nx),
+                           "wave_height", time_value)
+        for t, time_value in enumerate(sim["times"])
+    ]
+    xdmf_path.write_text(
+        '<?xml version="1.0" ?>\n'
+        '<Xdmf Version="2.0">\n<Domain>\n' + seabed + "\n" +
+        '<Grid Name="wave" GridType="Collection" CollectionType="Temporal">\n'
+        + "\n".join(steps) + "\n</Grid>\n</Domain>\n</Xdmf>\n")
+
+    print(f"Time series saved in: {h5_path.resolve()} "
+          f"(index: {xdmf_path.resolve()})")
+
+
+def _vtk_params_hash(pc: PointCloudData, file_format: str, compression: str,
+                     stride: int) -> str:
+    """Hash of everything besides the wave heights that shapes VTK output."""
+    digest = hashlib.sha256(
+        json.dumps(
+            {
+                "format": file_format,
+                "compression": compression,
+                "stride": stride,
+                "grid_dimensions": list(pc.grid_dimensions),
+                "min_z": float(pc.min_z),
+                "vertical_exaggeration": float(pc.vertical_exaggeration),
+            },
+            sort_keys=True).encode())
+    digest.update(np.ascontiguousarray(pc.bed_points).tobytes())
+    return digest.hexdigest()
+
+
+def _manifest_entry(file: pathlib.Path,
+                    params_hash: str,
+                    time_value=None,
+                    source_index: int | None = None) -> dict:
+    with open(file, "rb") as f:
+        sha256 = hashlib.file_digest(f, "sha256").hexdigest()
+    st = file.stat()
+    entry = {
+        "params_hash": params_hash,
+        "sha256": sha256,
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+    }
+    if time_value is not None:
+        entry["time"] = float(time_value)
+        entry["source_index"] = source_index
+    return entry
+
+
+def _is_current(entry: dict | None,
+                file: pathlib.Path,
+                params_hash: str,
+                time_value=None) -> bool:
+    """
+    Whether `file` is still the output recorded in `entry`: same
+    parameters and time, and not modified since (size and mtime).
+    """
+    if entry is None or entry.get("params_hash") != params_hash:
+        return False
+    if time_value is not None and entry.get("time") != float(time_value):
+        return False
+    try:
+        st = file.stat()
+    except OSError:
+        return False
+    return (st.st_size == entry.get("size") and
+            st.st_mtime_ns == entry.get("mtime_ns"))
+
+
+def _load_vtk_manifest(manifest_file: pathlib.Path) -> dict:
+    try:
+        with open(manifest_file, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_vtk_manifest(manifest_file: pathlib.Path, manifest: dict) -> None:
+    tmp_file = manifest_file.with_name(manifest_file.name + ".tmp")
+    with open(tmp_file, "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_file, manifest_file)
 
 
 def export_vtk_sequence(ds,
                         vtk_dir: str = "VTK",
                         target_vertical_fraction: float = 0.2,
-                        wave_prefix: str = "wave") -> None:
+                        wave_prefix: str = "wave",
+                        file_format: str = "vtk",
+                        compression: str = "zlib",
+                        writer_threads: int = 2,
+                        queue_depth: int = 8,
+                        stride: int = 1,
+                        t_start: float | None = None,
+                        t_end: float | None = None,
+                        t_stride: int = 1,
+                        use_cache: bool = True,
+                        first_step: int = 0,
+                        scene: tuple[dict, PointCloudData] | None = None,
+                        incremental: bool = True) -> None:
     """
     Export a single seabed mesh plus a time-series of wave meshes to VTK files.
+    A `<wave_prefix>.pvd` collection with the real `globaltime` values is
+    written alongside, so ParaView loads the sequence as one dataset.
+
+    Wave points are generated on the calling thread while a pool of writer
+    threads serialises and flushes finished frames, so computation and disk
+    I/O overlap. The achieved frames/s and MB/s are reported at the end.
+
+    A `<wave_prefix>.manifest.json` in `vtk_dir` records, for every file,
+    its source time index and time, a hash of the export parameters
+    (format, compression, stride and the exaggerated seabed geometry) and
+    its size, mtime and SHA-256. With `incremental`, later exports only
+    write the frames that are missing, were modified since, or were made
+    with other parameters, so extending a run costs only its new frames.
+    Changed wave heights at unchanged times are not detected; re-export
+    with `incremental=False` after re-running a simulation in place.
 
     Parameters:
         ds (xr.Dataset): your XBeach netcdf dataset.
@@ -191,33 +842,147 @@ def export_vtk_sequence(ds,
         target_vertical_fraction (float): same exaggeration fraction
         used in prepare_point_clouds.
         wave_prefix (str): prefix for wave filenames (e.g. 'wave_0000.vtk').
+        file_format (str): "vtk" for legacy files, "vts" for XML
+        structured-grid files with binary appended data, or "xdmf" for a
+        single HDF5 file (see `export_xdmf_time_series`).
+        compression (str): compressor for "vts" files: "none", "zlib",
+        "lz4" or "lzma".
+        writer_threads (int): number of threads writing frames to disk.
+        queue_depth (int): maximum number of generated frames waiting to
+        be written.
+        stride (int): spatial stride applied to the grid.
+        t_start, t_end (float | None): time window in seconds; only the
+        selected steps are read and exported.
+        t_stride (int): keep every `t_stride`-th output step.
+        use_cache (bool): reuse the prepared point clouds cached on disk
+        (see `prepare_scene`).
+        first_step (int): only write the wave frames from this step on, and
+        the seabed if it is missing; the `.pvd` still indexes every step.
+        Used to extend a series as a run grows.
+        scene (tuple | None): prepared `(sim, point_clouds)` pair of the
+        selected steps to export instead of preparing one from `ds`.
+        incremental (bool): keep up-to-date frames listed in the manifest
+        instead of rewriting every file.
     """
-    # 1) pull simulation arrays
-    sim = get_simulation_variables(ds)
-    X, Y, Zb, Zs, H = sim["X"], sim["Y"], sim["Zb"], sim["Zs"], sim["H"]
-
-    # 2) prepare the point clouds (initial wave step)
-    pc = prepare_point_clouds(X, Y, Zb, Zs, H[0], target_vertical_fraction)
-
-    # 3) make output directory
+    if file_format == "xdmf":
+        if first_step or scene is not None:
+            raise ValueError("Incremental export is not supported for the "
+                             "xdmf format.")
+        export_xdmf_time_series(ds,
+                                str(pathlib.Path(vtk_dir) /
+                                    f"{wave_prefix}.xdmf"),
+                                target_vertical_fraction, compression, stride,
+                                t_start, t_end, t_stride, use_cache)
+        return
+
+    if file_format not in VTK_FILE_FORMATS:
+        raise ValueError(f"Unsupported VTK format {file_format!r}; "
+                         f"expected one of {VTK_FILE_FORMATS}.")
+    if compression not in VTS_COMPRESSORS:
+        raise ValueError(f"Unsupported compression {compression!r}; "
+                         f"expected one of {tuple(VTS_COMPRESSORS)}.")
+
+    # 1-2) pull simulation arrays and prepare the point clouds (cached)
+    all_times = ds["globaltime"].values
+    ds = select_time_window(ds, t_start, t_end, t_stride)
+    # Index of every selected step in the unselected dataset.
+    source_indices = np.searchsorted(all_times, ds["globaltime"].values)
+    if scene is None:
+        scene = prepare_scene(ds, stride, 1, target_vertical_fraction,
+                              use_cache)
+    sim, pc = scene
+    Zs, H = sim["Zs"], sim["H"]
+
+    # 3) make output directory and read what a previous export left there
     out_path = pathlib.Path(vtk_dir)
     out_path.mkdir(parents=True, exist_ok=True)
+    manifest_file = out_path / f"{wave_prefix}{VTK_MANIFEST_SUFFIX}"
+    manifest = _load_vtk_manifest(manifest_file) if incremental else {}
+    old_frames = manifest.get("frames", {})
+    params_hash = _vtk_params_hash(pc, file_format, compression, stride)
 
     # 4) write static seabed
-    seabed_grid = _build_structured_grid(pc.bed_points, pc.grid_dimensions,
-                                         "elevation")
-    seabed_file = out_path / "seabed.vtk"
-    seabed_grid.save(str(seabed_file))
-    print(f"  • Wrote seabed mesh → {seabed_file}")
+    seabed_file = out_path / f"seabed.{file_format}"
+    seabed_entry = manifest.get("seabed")
+    if not _is_current(seabed_entry, seabed_file, params_hash):
+        seabed_grid = _build_structured_grid(pc.bed_points,
+                                             pc.grid_dimensions, "elevation")
+        _save_grid(seabed_grid, seabed_file, compression)
+        seabed_entry = _manifest_entry(seabed_file, params_hash)
+        print(f"  • Wrote seabed mesh → {seabed_file}")
 
     nt = H.shape[0]
-    for t, pts in enumerate(iterate_time_steps(pc, Zs, H)):
-        wave_grid = _build_structured_grid(pts, pc.grid_dimensions,
-                                           "wave_height")
-
-        fname = out_path / f"{wave_prefix}_{t:04d}.vtk"
-        wave_grid.save(str(fname))
-        if t % 10 == 0 or t == nt - 1:
-            print(f"  • Wrote frame {t+1}/{nt} → {fname}")
+    times = sim["times"]
+    wave_files = [
+        out_path / f"{wave_prefix}_{t:04d}.{file_format}" for t in range(nt)
+    ]
+    frames = {}
+    todo = []
+    for t, wave_file in enumerate(wave_files):
+        entry = old_frames.get(wave_file.name)
+        if t < first_step:
+            # Written by an earlier call; only listed if it was recorded.
+            if entry is not None:
+                frames[wave_file.name] = entry
+        elif _is_current(entry, wave_file, params_hash, times[t]):
+            frames[wave_file.name] = entry
+        else:
+            todo.append(t)
+
+    def write_frame(t: int, pts: np.ndarray) -> int:
+        try:
+            wave_grid = _build_structured_grid(pts, pc.grid_dimensions,
+                                               "wave_height")
+            _save_grid(wave_grid, wave_files[t], compression)
+            if t % 10 == 0 or t == nt - 1:
+                with print_lock:
+                    print(f"  • Wrote frame {t+1}/{nt} → {wave_files[t]}")
+            entry = _manifest_entry(wave_files[t], params_hash, times[t],
+                                    int(source_indices[t]))
+            frames[wave_files[t].name] = entry
+            return entry["size"]
+        finally:
+            free_slots.release()
+
+    # Point generation runs ahead of the writer threads by at most
+    # `queue_depth` frames, which bounds the memory held by pending frames.
+    free_slots = threading.BoundedSemaphore(max(queue_depth, 1))
+    # Writer threads report progress concurrently; keep their lines whole.
+    print_lock = threading.Lock()
+    base_xy = pc.wave_points[:, :2]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(writer_threads, 1)) as writers:
+        futures = []
+        for t in todo:
+            pts = update_wave_points(base_xy, Zs, np.asarray(H[t]), pc.min_z,
+                                     pc.vertical_exaggeration)
+            free_slots.acquire()
+            futures.append(writers.submit(write_frame, t, pts))
+        written_bytes = sum(future.result() for future in futures)
+    elapsed = time.perf_counter() - start
+
+    written = len(todo)
+    print(f"  • {written} frames in {elapsed:.1f} s: "
+          f"{written / max(elapsed, 1e-9):.1f} frames/s, "
+          f"{written_bytes / 1e6 / max(elapsed, 1e-9):.1f} MB/s"
+          + (f" ({nt - written} up-to-date frames kept)"
+             if written < nt else ""))
+
+    # Frames beyond the current series (e.g. after narrowing the time
+    # window) would otherwise still be picked up as part of the sequence.
+    for name in old_frames.keys() - {f.name for f in wave_files}:
+        (out_path / name).unlink(missing_ok=True)
+
+    _save_vtk_manifest(
+        manifest_file, {
+            "params_hash": params_hash,
+            "seabed": seabed_entry,
+            "frames": {f.name: frames[f.name] for f in wave_files
+                       if f.name in frames},
+        })
+
+    pvd_file = out_path / f"{wave_prefix}.pvd"
+    write_pvd_collection(pvd_file, wave_files, sim["times"])
+    print(f"  • Wrote time-series index → {pvd_file}")
 
     print(f"All VTK meshes saved in: {out_path.resolve()}")
@@ -3,10 +3,22 @@
 import os
 import shutil
 import argparse
+import multiprocessing
 import pathlib
 import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
 from data_processing import open_netcdf_file
-from visualization import animate_wave, export_vtk_sequence
+from derived_cache import lookup_source, remember_source
+from follow import follow_netcdf
+from task_storage import (InductivaTaskStorage, LocalTaskStorage,
+                          is_download_complete, subset_remote_netcdf,
+                          sync_task_files)
+from video_encoding import EncoderSettings
+from visualization import (HDF5_COMPRESSORS, VTK_FILE_FORMATS, VTS_COMPRESSORS,
+                           animate_wave, export_vtk_sequence)
 from xbTools.xbeachpost import XBeachModelAnalysis as BaseXBeachModelAnalysis
 
 GLOBAL_VARS_PARAM_NAME = "globalvar"
@@ -15,6 +27,22 @@ OUTPUT_FORMAT_PARAM_NAME = "outputformat"
 OUTPUT_FILENAME_PARAM_NAME = "ncfilename"
 DEFAULT_OUTPUT_FILENAME = "xboutput.nc"
 DEFAULT_OUTPUT_FORMAT = "netcdf"
+# Files needed to locate and validate the NetCDF output of a run.
+METADATA_FILES = {"XBlog.txt", "params.txt"}
+# Variables streamed by --subset-variables when none are named.
+SUBSET_VARIABLES = ("globalx", "globaly", "zb", "zs", "H")
+# Interval at which batch runs sample their resident memory.
+MEMORY_SAMPLE_SECONDS = 0.05
+
+
+class BatchRunResult(NamedTuple):
+    name: str
+    status: str
+    wall_seconds: float
+    peak_rss_mb: float
+    # Resident memory of the worker when the run started; workers are
+    # reused, so it includes what earlier runs left allocated.
+    start_rss_mb: float
 
 
 class PatchedXBeachModelAnalysis(BaseXBeachModelAnalysis):
@@ -31,24 +59,47 @@ class PatchedXBeachModelAnalysis(BaseXBeachModelAnalysis):
             }
 
 
-def fetch_simulation_by_task_id(task_id: str,
-                                overwrite: bool = False) -> pathlib.Path:
-    """
-    """
-    import inductiva
-    task = inductiva.tasks.Task(task_id)
-    base_output = pathlib.Path(inductiva.get_output_dir()) / task_id
+def _task_results_dir(task_id: str,
+                      download_dir: pathlib.Path | None) -> pathlib.Path:
+    if download_dir is None:
+        import inductiva
+        download_dir = inductiva.get_output_dir()
+    return pathlib.Path(download_dir) / task_id
 
-    # If already present and user didn't ask to overwrite, just return it
-    if base_output.exists() and not overwrite:
-        return base_output
 
-    output_dir = pathlib.Path(inductiva.get_output_dir()) / task_id
+def _open_task_storage(task_id: str, storage_dir: pathlib.Path | None):
+    if storage_dir is not None:
+        return LocalTaskStorage(storage_dir, task_id)
+    import inductiva
+    return InductivaTaskStorage(inductiva.tasks.Task(task_id))
 
-    task.download_outputs()
-    task.download_inputs()
 
-    return output_dir
+def fetch_simulation_by_task_id(task_id: str,
+                                overwrite: bool = False,
+                                storage_dir: pathlib.Path | None = None,
+                                download_dir: pathlib.Path | None = None,
+                                max_workers: int = 4) -> pathlib.Path:
+    """
+    Download the inputs and outputs of a task into
+    `<download_dir>/<task_id>/` (by default inductiva's output directory)
+    and return that folder.
+
+    Files are fetched concurrently and recorded in a download index (see
+    `task_storage.sync_task_files`): a finished download is reused as is,
+    an interrupted one resumes, and with `overwrite` only files that
+    changed are fetched again. With `storage_dir`, files come from a local
+    stand-in laid out as `<storage_dir>/<task_id>/{inputs,outputs}/`
+    instead of Inductiva.
+    """
+    results_dir = _task_results_dir(task_id, download_dir)
+    if is_download_complete(results_dir) and not overwrite:
+        return results_dir
+
+    storage = _open_task_storage(task_id, storage_dir)
+    return sync_task_files(storage,
+                           results_dir,
+                           max_workers=max_workers,
+                           verify=overwrite)
 
 
 def _make_combined_dir(source_dirs: list[pathlib.Path],
@@ -148,6 +199,368 @@ def _verify_xbeach_simulation_minimal_requirements(
     return True, output_filename
 
 
+def fetch_task_netcdf(task_id: str,
+                      overwrite: bool = False,
+                      storage_dir: pathlib.Path | None = None,
+                      download_dir: pathlib.Path | None = None,
+                      max_workers: int = 4,
+                      variables: tuple[str, ...] | None = None,
+                      t_start: float | None = None,
+                      t_end: float | None = None) -> pathlib.Path:
+    """
+    Fetch only what animation and VTK export need from a task: first
+    `XBlog.txt` and `params.txt`, from which the NetCDF filename is
+    worked out, then that NetCDF file alone.
+
+    With `variables`, not even the whole NetCDF file is downloaded: only
+    those variables within `t_start <= globaltime <= t_end` are streamed
+    from the remote file into `<name>.subset.nc` (see
+    `task_storage.subset_remote_netcdf`).
+
+    Returns the local NetCDF path; exits with an error message if the run
+    cannot be visualized.
+    """
+    results_dir = _task_results_dir(task_id, download_dir)
+    storage = _open_task_storage(task_id, storage_dir)
+
+    sync_task_files(
+        storage,
+        results_dir,
+        max_workers=max_workers,
+        verify=overwrite,
+        only=lambda key: pathlib.PurePosixPath(key).name in METADATA_FILES)
+
+    sim = PatchedXBeachModelAnalysis("CLI_Run",
+                                     str(merge_simulation_dirs(results_dir)))
+    ok, nc_filename_or_err = _verify_xbeach_simulation_minimal_requirements(sim)
+    if not ok:
+        print(f"Error: {nc_filename_or_err}", file=sys.stderr)
+        sys.exit(1)
+
+    nc_key = f"outputs/{nc_filename_or_err}"
+    if variables is None:
+        sync_task_files(storage,
+                        results_dir,
+                        max_workers=max_workers,
+                        verify=overwrite,
+                        only=lambda key: key == nc_key)
+        nc_path = results_dir / nc_key
+        if not nc_path.exists():
+            print(f"Error: NetCDF file {nc_key!r} not found in task {task_id}.",
+                  file=sys.stderr)
+            sys.exit(1)
+        return nc_path
+
+    subset_path = results_dir / "outputs" / (
+        pathlib.Path(nc_filename_or_err).stem + ".subset.nc")
+    return subset_remote_netcdf(storage, "outputs", nc_filename_or_err,
+                                subset_path, variables, t_start, t_end)
+
+
+def _source_key(args) -> str:
+    """Key identifying the simulation source selected on the command line."""
+    if args.input_dir:
+        return (f"dirs:{args.input_dir.resolve()}:"
+                f"{args.output_dir.resolve() if args.output_dir else ''}")
+    if args.results_dir:
+        return f"results:{args.results_dir.resolve()}"
+    # Task downloads also depend on where they come from and go to, and on
+    # what is fetched.
+    storage_dir = (args.task_storage_dir.resolve()
+                   if args.task_storage_dir else "inductiva")
+    task = f"task:{args.task_id}:{_task_download_dir(args)}:{storage_dir}"
+    if args.subset_variables is not None:
+        # Subsets depend on the variables and time window streamed.
+        return (f"{task}:subset:{','.join(_subset_variables(args))}:"
+                f"{args.t_start}:{args.t_end}")
+    if args.selective_fetch:
+        return f"{task}:selective"
+    return f"{task}:full"
+
+
+def _task_download_dir(args) -> pathlib.Path:
+    """Resolved folder receiving the downloads of `--task-id`."""
+    return _task_results_dir(args.task_id, args.download_dir).resolve()
+
+
+def _subset_variables(args) -> tuple[str, ...]:
+    return tuple(args.subset_variables or SUBSET_VARIABLES)
+
+
+def _resolve_netcdf_file(args) -> pathlib.Path:
+    """
+    Locate the NetCDF output of the selected simulation: build the combined
+    symlink folder, parse XBlog.txt and verify the run can be visualized.
+    Exits with an error message otherwise.
+    """
+    # Decide source of inputs/outputs and build `combined` symlink folder
+    if args.input_dir:
+        if not args.output_dir:
+            print("Error: --input-dir requires --output-dir", file=sys.stderr)
+            sys.exit(1)
+        combined = merge_separate_dirs(args.input_dir, args.output_dir)
+
+    elif args.results_dir:
+        if not args.results_dir.is_dir():
+            print(f"Error: {args.results_dir!r} is not a directory.",
+                  file=sys.stderr)
+            sys.exit(1)
+        combined = merge_simulation_dirs(args.results_dir)
+
+    elif args.selective_fetch or args.subset_variables is not None:
+        return fetch_task_netcdf(
+            args.task_id,
+            args.overwrite_downloads,
+            storage_dir=args.task_storage_dir,
+            download_dir=args.download_dir,
+            max_workers=args.download_workers,
+            variables=(_subset_variables(args)
+                       if args.subset_variables is not None else None),
+            t_start=args.t_start,
+            t_end=args.t_end)
+
+    else:
+        # must be a task_id
+        results_dir = fetch_simulation_by_task_id(
+            args.task_id,
+            args.overwrite_downloads,
+            storage_dir=args.task_storage_dir,
+            download_dir=args.download_dir,
+            max_workers=args.download_workers)
+        if not results_dir.is_dir():
+            print(f"Error: {results_dir!r} is not a directory.",
+                  file=sys.stderr)
+            sys.exit(1)
+        combined = merge_simulation_dirs(results_dir)
+
+    # Load and verify simulation
+    sim = PatchedXBeachModelAnalysis("CLI_Run", str(combined))
+    ok, nc_filename_or_err = _verify_xbeach_simulation_minimal_requirements(sim)
+    if not ok:
+        print(f"Error: {nc_filename_or_err}", file=sys.stderr)
+        sys.exit(1)
+
+    nc_path = combined / nc_filename_or_err
+    if not nc_path.exists():
+        print(f"Error: NetCDF file {nc_path!r} does not exist.",
+              file=sys.stderr)
+        sys.exit(1)
+
+    return nc_path
+
+
+def _find_netcdf_file(args) -> pathlib.Path:
+    """
+    NetCDF file of the selected source, from the source cache when possible
+    (see `derived_cache.lookup_source`).
+    """
+    source_key = _source_key(args)
+    if not args.no_cache and not args.overwrite_downloads:
+        nc_path = lookup_source(source_key)
+        if (nc_path is not None and args.task_id
+                and not nc_path.resolve().is_relative_to(
+                    _task_download_dir(args))):
+            nc_path = None
+        if nc_path is not None:
+            print(f"  • Using cached NetCDF location {nc_path}")
+            return nc_path
+    nc_path = _resolve_netcdf_file(args)
+    if not args.no_cache:
+        remember_source(source_key, nc_path.resolve())
+    return nc_path
+
+
+def run_simulation(args,
+                   out_dir: pathlib.Path = pathlib.Path("."),
+                   reuse_render_context: bool = False) -> None:
+    """
+    Animate and/or export the source selected in `args`, writing
+    `wave.mp4` and the VTK directory under `out_dir`.
+    """
+    nc_path = _find_netcdf_file(args)
+
+    dataset = open_netcdf_file(str(nc_path), streaming=args.stream)
+    selection = {
+        "stride": args.spatial_stride,
+        "t_start": args.t_start,
+        "t_end": args.t_end,
+        "t_stride": args.t_stride,
+        "use_cache": not args.no_cache,
+    }
+
+    if args.animate_wave:
+        print("▶ Generating animation…")
+        animate_wave(dataset,
+                     out_file=str(out_dir / "wave.mp4"),
+                     angle=tuple(args.angle),
+                     fps=args.fps,
+                     workers=args.workers,
+                     lod=args.lod,
+                     encoder=EncoderSettings(preset=args.preset,
+                                             crf=args.crf,
+                                             threads=args.encode_threads,
+                                             pix_fmt=args.pix_fmt),
+                     target_vertical_fraction=args.vertical_fraction,
+                     reuse_render_context=reuse_render_context,
+                     **selection)
+        print("✔ Animation done.")
+
+    if args.export_vtk:
+        print("▶ Exporting VTK sequence…")
+        export_vtk_sequence(dataset,
+                            vtk_dir=str(out_dir / args.vtk_dir),
+                            target_vertical_fraction=args.vertical_fraction,
+                            file_format=args.vtk_format,
+                            compression=args.vtk_compression,
+                            writer_threads=args.writer_threads,
+                            queue_depth=args.write_queue_depth,
+                            incremental=not args.vtk_full_export,
+                            **selection)
+        print("✔ VTK export done.")
+
+
+def follow_simulation(args) -> None:
+    """Animate and/or export the selected run while it is still writing."""
+    nc_path = _find_netcdf_file(args)
+    follow_netcdf(str(nc_path),
+                  animate=args.animate_wave,
+                  export_vtk=args.export_vtk,
+                  out_file="wave.mp4",
+                  vtk_dir=str(args.vtk_dir),
+                  angle=tuple(args.angle),
+                  fps=args.fps,
+                  stride=args.spatial_stride,
+                  target_vertical_fraction=args.vertical_fraction,
+                  encoder=EncoderSettings(preset=args.preset,
+                                          crf=args.crf,
+                                          threads=args.encode_threads,
+                                          pix_fmt=args.pix_fmt),
+                  file_format=args.vtk_format,
+                  compression=args.vtk_compression,
+                  writer_threads=args.writer_threads,
+                  queue_depth=args.write_queue_depth,
+                  poll_seconds=args.poll_interval,
+                  idle_timeout=args.follow_timeout)
+
+
+def read_batch_manifest(manifest: pathlib.Path) -> list[str]:
+    """
+    Entries of a batch manifest: one results dir or task ID per line; blank
+    lines and lines starting with '#' are ignored.
+    """
+    if not manifest.is_file():
+        raise FileNotFoundError(f"Batch manifest {manifest} not found")
+    entries = []
+    with open(manifest, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                entries.append(line)
+    return entries
+
+
+def _batch_run_names(entries: list[str]) -> list[str]:
+    """Unique output folder names for the manifest entries."""
+    names = []
+    for entry in entries:
+        name = pathlib.Path(entry).name or entry
+        if name in names:
+            name = f"{name}_{len(names)}"
+        names.append(name)
+    return names
+
+
+def _run_batch_entry(args, entry: str, name: str) -> BatchRunResult:
+    """
+    Process one manifest entry with the batch options and measure its wall
+    time and the peak resident memory of its worker, sampled during the
+    run. Runs handled by the same worker process share its render context
+    (and whatever memory earlier runs left allocated), so the growth over
+    the worker's memory at the start of the run is reported too.
+    """
+    import psutil
+
+    process = psutil.Process()
+    start_rss = peak_rss = process.memory_info().rss
+    done = threading.Event()
+
+    def sample_memory():
+        nonlocal peak_rss
+        while not done.wait(MEMORY_SAMPLE_SECONDS):
+            peak_rss = max(peak_rss, process.memory_info().rss)
+
+    is_dir = pathlib.Path(entry).is_dir()
+    run_args = argparse.Namespace(
+        **{
+            **vars(args),
+            "batch": None,
+            "input_dir": None,
+            "output_dir": None,
+            "results_dir": pathlib.Path(entry) if is_dir else None,
+            "task_id": None if is_dir else entry,
+        })
+    out_dir = args.batch_output_dir / name
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    sampler = threading.Thread(target=sample_memory, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    status = "ok"
+    print(f"▶ [{name}] {entry}")
+    try:
+        run_simulation(run_args, out_dir, reuse_render_context=True)
+    except SystemExit:
+        status = "failed"
+    except Exception as e:
+        print(f"Error: [{name}] {type(e).__name__}: {e}", file=sys.stderr)
+        status = "failed"
+    wall_seconds = time.perf_counter() - start
+    done.set()
+    sampler.join()
+    peak_rss = max(peak_rss, process.memory_info().rss)
+    return BatchRunResult(name, status, wall_seconds, peak_rss / 1e6,
+                          start_rss / 1e6)
+
+
+def run_batch(args) -> list[BatchRunResult]:
+    """
+    Process every entry of the `--batch` manifest. Entries are scheduled
+    across `--batch-workers` spawned processes, so the Python, VTK and
+    pyvista imports and the off-screen render context are paid once per
+    worker rather than once per run.
+    """
+    entries = read_batch_manifest(args.batch)
+    names = _batch_run_names(entries)
+    if args.batch_workers <= 1:
+        return [
+            _run_batch_entry(args, entry, name)
+            for entry, name in zip(entries, names)
+        ]
+
+    # VTK render contexts are not fork-safe, so workers are spawned.
+    with ProcessPoolExecutor(
+            max_workers=args.batch_workers,
+            mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [
+            executor.submit(_run_batch_entry, args, entry, name)
+            for entry, name in zip(entries, names)
+        ]
+        return [future.result() for future in futures]
+
+
+def print_batch_summary(results: list[BatchRunResult]) -> None:
+    name_width = max([len("run")] + [len(r.name) for r in results])
+    print(f"\n{'run':<{name_width}}  {'status':<8} {'wall [s]':>10} "
+          f"{'peak RSS [MB]':>14} {'run +RSS [MB]':>14}")
+    for r in results:
+        print(f"{r.name:<{name_width}}  {r.status:<8} {r.wall_seconds:>10.1f} "
+              f"{r.peak_rss_mb:>14.1f} "
+              f"{r.peak_rss_mb - r.start_rss_mb:>14.1f}")
+    total = sum(r.wall_seconds for r in results)
+    print(f"{len(results)} runs, {sum(r.status == 'ok' for r in results)} ok, "
+          f"{total:.1f} s of run time")
+
+
 def parse_args():
     p = argparse.ArgumentParser(
         description=
@@ -170,6 +583,13 @@ def parse_args():
         type=pathlib.Path,
         help="Path to the inputs directory (when outputs are elsewhere).",
     )
+    src_group.add_argument(
+        "--batch",
+        type=pathlib.Path,
+        metavar="MANIFEST",
+        help="Text file listing one results dir or task ID per line; all "
+        "runs are processed with the same options.",
+    )
 
     # Only meaningful when --input-dir is chosen:
     p.add_argument(
@@ -178,11 +598,57 @@ def parse_args():
         help="Path to the outputs directory (used with --input-dir).",
     )
 
+    p.add_argument(
+        "--batch-workers",
+        type=int,
+        default=1,
+        help="Number of processes working through the --batch manifest.")
+
+    p.add_argument(
+        "--batch-output-dir",
+        type=pathlib.Path,
+        default=pathlib.Path("batch"),
+        help="Directory receiving one output folder per --batch run.")
+
     p.add_argument(
         "--overwrite-downloads",
         action="store_true",
-        help=
-        "If set, always re-download inputs/outputs even if they already exist.")
+        help="If set, re-check downloaded inputs/outputs against the remote "
+        "checksums and re-download the ones that changed.")
+
+    p.add_argument(
+        "--download-dir",
+        type=pathlib.Path,
+        default=None,
+        help="Folder receiving <task-id>/ downloads (default: inductiva's "
+        "output directory).")
+
+    p.add_argument("--download-workers",
+                   type=int,
+                   default=4,
+                   help="Number of files downloaded concurrently.")
+
+    p.add_argument(
+        "--selective-fetch",
+        action="store_true",
+        help="For --task-id, download only XBlog.txt, params.txt and the "
+        "NetCDF output instead of every input and output file.")
+
+    p.add_argument(
+        "--subset-variables",
+        nargs="*",
+        default=None,
+        metavar="VAR",
+        help="For --task-id, stream only these NetCDF variables (default: "
+        f"{' '.join(SUBSET_VARIABLES)}) within --t-start/--t-end from the "
+        "remote file; implies --selective-fetch.")
+
+    p.add_argument(
+        "--task-storage-dir",
+        type=pathlib.Path,
+        default=None,
+        help="Fetch --task-id files from <dir>/<task-id>/{inputs,outputs}/ "
+        "instead of Inductiva (local stand-in for remote storage).")
 
     p.add_argument(
         "--animate-wave",
@@ -199,6 +665,40 @@ def parse_args():
         default=10,
         help="Frames per second for the animation (if --animate-wave).")
 
+    p.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes rendering animation segments in parallel "
+        "(if --animate-wave).")
+
+    p.add_argument(
+        "--preset",
+        type=str,
+        default="medium",
+        help="x264 preset for the animation, e.g. ultrafast, fast, medium, "
+        "slow (if --animate-wave).")
+
+    p.add_argument(
+        "--crf",
+        type=int,
+        default=18,
+        help="x264 constant rate factor; lower is higher quality "
+        "(if --animate-wave).")
+
+    p.add_argument(
+        "--encode-threads",
+        type=int,
+        default=0,
+        help="x264 encoder threads; 0 picks automatically "
+        "(if --animate-wave).")
+
+    p.add_argument("--pix-fmt",
+                   type=str,
+                   default="yuv420p",
+                   help="Output pixel format of the animation "
+                   "(if --animate-wave).")
+
     p.add_argument(
         "--angle",
         type=float,
@@ -213,6 +713,39 @@ def parse_args():
         default=pathlib.Path("VTK"),
         help="Directory in which to write VTK files (if --export-vtk).")
 
+    p.add_argument(
+        "--vtk-format",
+        choices=VTK_FILE_FORMATS,
+        default="vtk",
+        help="VTK file format: legacy 'vtk', XML binary 'vts', or 'xdmf' "
+        "for one HDF5 file with geometry stored once (if --export-vtk).")
+
+    p.add_argument(
+        "--vtk-compression",
+        choices=tuple(VTS_COMPRESSORS),
+        default="zlib",
+        help="Compression of 'vts'/'xdmf' output (if --export-vtk).")
+
+    p.add_argument(
+        "--writer-threads",
+        type=int,
+        default=2,
+        help="Threads writing VTK frames while the next frames are computed "
+        "(if --export-vtk).")
+
+    p.add_argument(
+        "--write-queue-depth",
+        type=int,
+        default=8,
+        help="Maximum number of computed frames waiting to be written; "
+        "bounds memory use (if --export-vtk).")
+
+    p.add_argument(
+        "--vtk-full-export",
+        action="store_true",
+        help="Rewrite every VTK frame instead of only the missing or stale "
+        "ones listed in the export manifest (if --export-vtk).")
+
     p.add_argument(
         "--vertical-fraction",
         type=float,
@@ -220,7 +753,71 @@ def parse_args():
         help="Vertical-exaggeration fraction for both animation and VTK export."
     )
 
-    return p.parse_args()
+    p.add_argument(
+        "--t-start",
+        type=float,
+        default=None,
+        help="Only use output steps at or after this time (seconds).")
+
+    p.add_argument(
+        "--t-end",
+        type=float,
+        default=None,
+        help="Only use output steps at or before this time (seconds).")
+
+    p.add_argument("--t-stride",
+                   type=int,
+                   default=1,
+                   help="Use every N-th output step.")
+
+    p.add_argument("--spatial-stride",
+                   type=int,
+                   default=1,
+                   help="Use every N-th grid point in both directions.")
+
+    p.add_argument(
+        "--lod",
+        action="store_true",
+        help="Block-average grids finer than the movie resolution before "
+        "rendering (if --animate-wave).")
+
+    p.add_argument(
+        "--follow",
+        action="store_true",
+        help="Keep polling the NetCDF file of a running simulation and only "
+        "render/export the newly written steps.")
+
+    p.add_argument("--poll-interval",
+                   type=float,
+                   default=30.0,
+                   help="Seconds between polls of the NetCDF file (if --follow).")
+
+    p.add_argument(
+        "--follow-timeout",
+        type=float,
+        default=600.0,
+        help="Stop following once the NetCDF file has not grown for this many "
+        "seconds (if --follow).")
+
+    p.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the derived-product cache "
+        "($XBEACH_ANIMATOR_CACHE_DIR, default ~/.cache/xbeach_animator).")
+
+    p.add_argument(
+        "--stream",
+        action="store_true",
+        help="Read wave heights one time step at a time instead of loading "
+        "the whole run into memory (lower peak memory for long runs).")
+
+    args = p.parse_args()
+    if (args.vtk_format == "xdmf"
+            and args.vtk_compression not in HDF5_COMPRESSORS):
+        p.error(f"--vtk-compression {args.vtk_compression} is not available "
+                f"with --vtk-format xdmf; use one of "
+                f"{', '.join(HDF5_COMPRESSORS)}")
+    return args
 
 
 def main():
@@ -233,59 +830,22 @@ def main():
             file=sys.stderr)
         sys.exit(1)
 
-    # Decide source of inputs/outputs and build `combined` symlink folder
-    if args.input_dir:
-        if not args.output_dir:
-            print("Error: --input-dir requires --output-dir", file=sys.stderr)
+    if args.batch:
+        results = run_batch(args)
+        print_batch_summary(results)
+        if any(r.status != "ok" for r in results):
             sys.exit(1)
-        combined = merge_separate_dirs(args.input_dir, args.output_dir)
+        return
 
-    elif args.results_dir:
-        if not args.results_dir.is_dir():
-            print(f"Error: {args.results_dir!r} is not a directory.",
+    if args.follow:
+        if args.vtk_format == "xdmf" and args.export_vtk:
+            print("Error: --follow does not support --vtk-format xdmf",
                   file=sys.stderr)
             sys.exit(1)
-        combined = merge_simulation_dirs(args.results_dir)
+        follow_simulation(args)
+        return
 
-    else:
-        # must be a task_id
-        results_dir = fetch_simulation_by_task_id(args.task_id,
-                                                  args.overwrite_downloads)
-        if not results_dir.is_dir():
-            print(f"Error: {results_dir!r} is not a directory.",
-                  file=sys.stderr)
-            sys.exit(1)
-        combined = merge_simulation_dirs(results_dir)
-
-    # Load and verify simulation
-    sim = PatchedXBeachModelAnalysis("CLI_Run", str(combined))
-    ok, nc_filename_or_err = _verify_xbeach_simulation_minimal_requirements(sim)
-    if not ok:
-        print(f"Error: {nc_filename_or_err}", file=sys.stderr)
-        sys.exit(1)
-
-    nc_path = combined / nc_filename_or_err
-    if not nc_path.exists():
-        print(f"Error: NetCDF file {nc_path!r} does not exist.",
-              file=sys.stderr)
-        sys.exit(1)
-
-    dataset = open_netcdf_file(str(nc_path))
-
-    if args.animate_wave:
-        print("▶ Generating animation…")
-        animate_wave(dataset,
-                     out_file="wave.mp4",
-                     angle=tuple(args.angle),
-                     fps=args.fps)
-        print("✔ Animation done.")
-
-    if args.export_vtk:
-        print("▶ Exporting VTK sequence…")
-        export_vtk_sequence(dataset,
-                            vtk_dir=str(args.vtk_dir),
-                            target_vertical_fraction=args.vertical_fraction)
-        print("✔ VTK export done.")
+    run_simulation(args)
 
 
 if __name__ == "__main__":